@@ -32,7 +32,8 @@ class SipwiseBackupCLI:
 
     def clear_screen(self):
         """Clear the terminal screen"""
-        os.system('clear')
+        # ANSI home + erase display; needs no external 'clear' binary
+        print("\033[H\033[2J", end="", flush=True)
 
     @property
     def storage_manager(self):
@@ -8,10 +8,11 @@ Handles backup operations including:
 """
 
 import os
+import shlex
 import shutil
 import subprocess
 from pathlib import Path
-from typing import Optional, Dict
+from typing import List, Optional, Dict
 from datetime import datetime
 
 # Import our storage module
@@ -37,28 +38,40 @@ class BackupManager:
         self.ngcp_config_path = Path("/etc/ngcp-config")
         self.logger = get_logger(config_path)
 
-    def _run_command(self, cmd: str) -> str:
+    def _run_command(self, argv: List[str], stdout=None, env: Optional[Dict[str, str]] = None) -> str:
         """
-        Run a shell command and return output
+        Run a command directly, without an intermediate shell
 
         Args:
-            cmd: Command to execute
+            argv: Command and its arguments
+            stdout: Optional file object to receive stdout instead of capturing it
+            env: Optional environment for the command
 
         Returns:
-            Command output as string
+            Command output as string (empty if stdout was redirected)
 
         Raises:
-            RuntimeError: If command fails
+            RuntimeError: If command fails or is not installed
         """
+        executable = shutil.which(argv[0])
+        if executable is None:
+            raise RuntimeError(f"Command not found: {argv[0]}")
+
         proc = subprocess.run(
-            cmd,
-            shell=True,
-            capture_output=True,
-            text=True
+            argv,
+            stdout=stdout if stdout is not None else subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            env=env,
+            # CPython only uses the faster posix_spawn() path for an explicit
+            # executable path with close_fds=False; descriptors opened by
+            # Python are non-inheritable (PEP 446) anyway
+            executable=executable,
+            close_fds=False
         )
         if proc.returncode != 0:
-            raise RuntimeError(f"Command failed: {cmd}\n{proc.stderr}")
-        return proc.stdout
+            raise RuntimeError(f"Command failed: {shlex.join(argv)}\n{proc.stderr}")
+        return proc.stdout or ""
 
     def _get_mysql_credentials(self) -> Dict[str, str]:
         """
@@ -132,19 +145,19 @@ class BackupManager:
             print("    (all databases, routines, triggers, events)")
 
             # Build mysqldump command
-            cmd = (
-                f"mysqldump --all-databases --routines --triggers --events "
-                f"-u {credentials['user']}"
-            )
+            argv = [
+                "mysqldump", "--all-databases", "--routines", "--triggers", "--events",
+                "-u", credentials['user']
+            ]
 
-            # Add password if provided
+            # Pass the password through the environment rather than argv
+            env = dict(os.environ)
             if credentials['password']:
-                cmd += f" -p{credentials['password']}"
-
-            # Redirect output to file
-            cmd += f" > {sql_file}"
+                env['MYSQL_PWD'] = credentials['password']
 
-            self._run_command(cmd)
+            # Write the dump straight to the file
+            with sql_file.open('wb') as f:
+                self._run_command(argv, stdout=f, env=env)
             self.logger.success("MySQL database dump completed")
             print(f"    Saved to: {sql_file}")
             return True
@@ -201,21 +214,32 @@ class BackupManager:
             # Step 4: Generate backup name and zip
             current_stage = "creating backup archive"
             backup_filename = self.storage.generate_backup_name(backup_type=backup_type)
-            print(f"[+] Creating backup archive: {backup_filename}")
-
-            zip_path = self.storage.zip_directory(
-                str(backup_dir),
-                backup_filename
-            )
-            print(f"    Backup size: {os.path.getsize(zip_path) / (1024*1024):.2f} MB")
+            if self.storage.get_storage_type() == 'remote':
+                # Steps 4+5: compress straight into the FTP upload so the two
+                # overlap and no archive is written to local disk
+                current_stage = "saving to storage"
+                print(f"[+] Creating backup archive and uploading to remote storage: {backup_filename}")
+                backup_size = self.storage.stream_backup_remote(str(backup_dir), backup_filename)
+
+                if backup_size is None:
+                    raise Exception("Failed to save backup to storage")
+                print(f"    Backup size: {backup_size / (1024*1024):.2f} MB")
+            else:
+                print(f"[+] Creating backup archive: {backup_filename}")
+
+                zip_path = self.storage.zip_directory(
+                    str(backup_dir),
+                    backup_filename
+                )
+                print(f"    Backup size: {os.path.getsize(zip_path) / (1024*1024):.2f} MB")
 
-            # Step 5: Save to storage
-            current_stage = "saving to storage"
-            print(f"[+] Saving backup to {self.storage.get_storage_type()} storage...")
-            save_success = self.storage.save_backup(zip_path)
+                # Step 5: Save to storage
+                current_stage = "saving to storage"
+                print(f"[+] Saving backup to {self.storage.get_storage_type()} storage...")
+                save_success = self.storage.save_backup(zip_path)
 
-            if not save_success:
-                raise Exception("Failed to save backup to storage")
+                if not save_success:
+                    raise Exception("Failed to save backup to storage")
 
             print(f"    Saved to: {self.storage.get_storage_directory()}")
 
@@ -94,6 +94,10 @@ class SipwiseLogger:
         console_handler.setFormatter(console_format)
         self.logger.addHandler(console_handler)
     
+    def is_debug_enabled(self) -> bool:
+        """Check whether debug messages would be emitted (to skip building them)"""
+        return self.logger.isEnabledFor(logging.DEBUG)
+    
     def debug(self, message: str, module: str = ""):
         """Log debug message"""
         self.logger.debug(message)
@@ -11,11 +11,17 @@ Handles restore operations including:
 
 import os
 import re
+import mmap
+import shlex
 import shutil
 import subprocess
 import socket
+import tempfile
+import threading
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Optional, Dict, Tuple
+from typing import ClassVar, FrozenSet, List, Optional, Dict, Tuple, Pattern
 import sys
 
 # Import our storage module
@@ -26,6 +32,27 @@ from logger import get_logger
 class RestoreManager:
     """Manages restore operations for sipwise-backup"""
 
+    __slots__ = (
+        'config_path',
+        'storage',
+        'config',
+        'tmp_dir',
+        'logger',
+        'target_key_line',
+        'firewall_enable_line',
+        '_preserved_key',
+        '_line_offset_cache',
+    )
+
+    # Paths and patterns that are identical for every instance
+    ngcp_config_dir: ClassVar[Path] = Path("/etc/ngcp-config")
+    source_constants: ClassVar[Path] = ngcp_config_dir / "constants.yml"
+    # Path to ngcp config.yml (different from our app's config.yml)
+    ngcp_config_yml: ClassVar[Path] = ngcp_config_dir / "config.yml"
+    exclude_files: ClassVar[FrozenSet[str]] = frozenset({"network.yml"})
+    # Pattern matches: optional whitespace, 'enable:', optional whitespace, yes/no
+    firewall_enable_pattern: ClassVar[Pattern] = re.compile(r'^\s*enable:\s*(yes|no)\s*$')
+
     def __init__(self, config_path: str = "/opt/sipwise-backup/config.yml"):
         """
         Initialize the RestoreManager
@@ -37,49 +64,59 @@ class RestoreManager:
         self.storage = StorageManager(config_path)
         self.config = self.storage.config
         self.tmp_dir = Path(self.storage.tmp_dir)
-        self.ngcp_config_dir = Path("/etc/ngcp-config")
-        self.source_constants = self.ngcp_config_dir / "constants.yml"
-        self.tempkey_path = self.tmp_dir / "tempkey"
         self.logger = get_logger(config_path)
-        
+        self._preserved_key = None
+        self._line_offset_cache = None
+
         # Get Sipwise config line numbers from config (with defaults for backward compatibility)
         sipwise_config = self.config.get('sipwise', {})
         constants_config = sipwise_config.get('constants_yml', {})
         config_yml_config = sipwise_config.get('config_yml', {})
-        
+
         self.target_key_line = constants_config.get('sql_encryption_key_line', 293)
         self.firewall_enable_line = config_yml_config.get('firewall_enable_line', 1568)
-        
-        # Path to ngcp config.yml (different from our app's config.yml)
-        self.ngcp_config_yml = self.ngcp_config_dir / "config.yml"
-        
-        self.exclude_files = {"network.yml"}
-        
-        # Compile regex pattern for firewall validation (done once at init)
-        # Pattern matches: optional whitespace, 'enable:', optional whitespace, yes/no
-        self.firewall_enable_pattern = re.compile(r'^\s*enable:\s*(yes|no)\s*$')
 
-    def _run_command(self, cmd: str, ignore_errors: bool = False, log_description: str = None) -> int:
+    @property
+    def tempkey_path(self) -> Path:
+        """Path of the temporary file holding the preserved SQL key"""
+        return self.tmp_dir / "tempkey"
+
+    def _run_command(self, argv: List[str], ignore_errors: bool = False, log_description: str = None) -> int:
         """
-        Run a shell command
+        Run a command directly, without an intermediate shell
 
         Args:
-            cmd: Command to execute
+            argv: Command and its arguments
             ignore_errors: If True, don't raise exception on failure
             log_description: Optional description for logging
 
         Returns:
-            Return code from command
+            Return code from command (127 if it is not installed)
         """
+        cmd = shlex.join(argv)
         log_msg = log_description or cmd
         self.logger.debug(f"Running command: {cmd}")
         print(f">>> {cmd}")
 
+        executable = shutil.which(argv[0])
+        if executable is None:
+            error_msg = f"Command not found: {argv[0]}"
+            self.logger.error(error_msg)
+            print(f"[ERROR] {error_msg}")
+            if not ignore_errors:
+                raise RuntimeError(error_msg)
+            # Same code a shell reports for a missing command
+            return 127
+
         result = subprocess.run(
-            cmd,
-            shell=True,
+            argv,
             capture_output=True,
-            text=True
+            text=True,
+            # CPython only uses the faster posix_spawn() path for an explicit
+            # executable path with close_fds=False; descriptors opened by
+            # Python are non-inheritable (PEP 446) anyway
+            executable=executable,
+            close_fds=False
         )
 
         # Log stdout if present
@@ -210,6 +247,55 @@ class RestoreManager:
         self.logger.success(f"Firewall disabled in {config_file}")
         print(f"[OK] Firewall disabled (changed from '{old_line.strip()}' to 'enable: no')")
 
+    def _locate_line(self, path: Path, line_number: int) -> Tuple[bytes, int, int]:
+        """
+        Locate a single line in a file without reading it into a list
+
+        The file is memory-mapped and scanned for newlines up to the wanted
+        line. The result is cached against the file's mtime and size so a
+        second lookup of an unchanged file costs a single stat().
+
+        Args:
+            path: File to search
+            line_number: 1-based line number
+
+        Returns:
+            Tuple of (line bytes without newline, start offset, end offset)
+
+        Raises:
+            FileNotFoundError: If the file does not exist
+            Exception: If the file has fewer lines than requested
+        """
+        st = path.stat()
+        cache_key = (str(path), st.st_mtime_ns, st.st_size, line_number)
+        if self._line_offset_cache is not None and self._line_offset_cache[0] == cache_key:
+            return self._line_offset_cache[1]
+
+        if st.st_size == 0:
+            raise Exception(f"{path.name} only has 0 lines!")
+
+        with path.open("rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            start = 0
+            for _ in range(line_number - 1):
+                newline = mm.find(b"\n", start)
+                if newline == -1:
+                    start = len(mm)
+                    break
+                start = newline + 1
+
+            if start >= len(mm):
+                line_count = len(mm[:].splitlines())
+                raise Exception(f"{path.name} only has {line_count} lines!")
+
+            end = mm.find(b"\n", start)
+            if end == -1:
+                end = len(mm)
+            line = mm[start:end]
+
+        result = (line, start, end)
+        self._line_offset_cache = (cache_key, result)
+        return result
+
     def extract_key(self) -> str:
         """
         Extract SQL encryption key from constants.yml line 293
@@ -221,15 +307,11 @@ class RestoreManager:
             Exception: If key cannot be extracted
         """
         try:
-            with self.source_constants.open("r") as f:
-                lines = f.readlines()
+            raw_line, _, _ = self._locate_line(self.source_constants, self.target_key_line)
         except FileNotFoundError:
             raise Exception(f"Cannot open {self.source_constants}")
 
-        if self.target_key_line > len(lines):
-            raise Exception(f"constants.yml only has {len(lines)} lines!")
-
-        line = lines[self.target_key_line - 1].strip()
+        line = raw_line.decode("utf-8").strip()
 
         if not line.startswith("key:"):
             raise Exception(
@@ -246,31 +328,39 @@ class RestoreManager:
         Args:
             key: The key to save
         """
+        self._preserved_key = key
         self.tempkey_path.parent.mkdir(parents=True, exist_ok=True)
         with self.tempkey_path.open("w") as f:
             f.write(key + "\n")
         print(f"[OK] Key saved to {self.tempkey_path}")
 
-    def restore_key_into_constants(self):
+    def restore_key_into_constants(self, key: Optional[str] = None):
         """
         Restore the original SQL encryption key back into constants.yml
 
+        Args:
+            key: The key to restore. If None, the key saved by save_key_to_temp()
+                is used, falling back to the tempkey file (crash recovery).
+
         Raises:
             Exception: If key cannot be restored
         """
-        try:
-            with self.tempkey_path.open("r") as f:
-                key = f.read().strip()
-        except FileNotFoundError:
-            raise Exception("Tempkey file missing!")
+        if key is None:
+            key = self._preserved_key
+
+        if key is None:
+            try:
+                with self.tempkey_path.open("r") as f:
+                    key = f.read().strip()
+            except FileNotFoundError:
+                raise Exception("Tempkey file missing!")
 
         try:
-            with self.source_constants.open("r") as f:
-                lines = f.readlines()
+            raw_line, start, end = self._locate_line(self.source_constants, self.target_key_line)
         except FileNotFoundError:
             raise Exception("Restored constants.yml missing!")
 
-        old_line = lines[self.target_key_line - 1].rstrip()
+        old_line = raw_line.decode("utf-8").rstrip()
 
         if not old_line.strip().startswith("key:"):
             raise Exception(
@@ -280,67 +370,110 @@ class RestoreManager:
         # Extract indentation and rebuild line with preserved formatting
         # Use split with limit=1 to handle edge cases like colons in key values
         indent = old_line.split("key:", 1)[0]
-        new_line = f"{indent}key: {key}\n"
-
-        lines[self.target_key_line - 1] = new_line
+        new_line = f"{indent}key: {key}".encode("utf-8")
 
-        with self.source_constants.open("w") as f:
-            f.writelines(lines)
+        if len(new_line) == end - start:
+            # Same length: overwrite just those bytes instead of the whole file
+            fd = os.open(self.source_constants, os.O_WRONLY)
+            try:
+                os.pwrite(fd, new_line, start)
+            finally:
+                os.close(fd)
+        else:
+            # Splice the new line in place of the old one, keeping the file's own newline
+            data = self.source_constants.read_bytes()
+            with self.source_constants.open("wb") as f:
+                f.write(data[:start])
+                f.write(new_line)
+                f.write(data[end:])
+        self._line_offset_cache = None
 
         print("[OK] Key successfully restored into constants.yml")
         print(f"[INFO] Key: {key}")
 
-    def restore_ngcp_config(self, restore_dir: Path):
+    def restore_ngcp_config(self, zip_path: str):
         """
         Restore NGCP configuration from backup
 
+        Archive members under ngcp-config/ are streamed straight into
+        /etc/ngcp-config without being unpacked to a temporary directory first.
+
         Args:
-            restore_dir: Directory containing extracted backup
+            zip_path: Path to the backup archive
 
         Raises:
             Exception: If restoration fails
         """
-        extracted_ngcp = restore_dir / "ngcp-config"
-        if not extracted_ngcp.exists():
-            raise Exception("Backup missing ngcp-config/")
-
-        self.logger.debug("Restoring NGCP configuration")
-        print("[INFO] Restoring ngcp-config...")
+        prefix = "ngcp-config/"
 
-        for item in extracted_ngcp.iterdir():
-            target = self.ngcp_config_dir / item.name
+        with zipfile.ZipFile(zip_path, 'r') as zipf:
+            members = [info for info in zipf.infolist() if info.filename.startswith(prefix)]
+            if not members:
+                raise Exception("Backup missing ngcp-config/")
 
-            if item.name in self.exclude_files:
-                print(f"[SKIP] Preserving existing {item.name}")
-                continue
+            self.logger.debug("Restoring NGCP configuration")
+            print("[INFO] Restoring ngcp-config...")
 
-            if target.exists():
-                if target.is_dir():
-                    shutil.rmtree(target)
-                else:
-                    target.unlink()
-
-            if item.is_dir():
-                shutil.copytree(item, target)
-            else:
-                shutil.copy(item, target)
+            # Snapshot existing entries once; DirEntry carries the file type
+            # from the directory read, so no per-entry stat() is needed
+            try:
+                with os.scandir(self.ngcp_config_dir) as it:
+                    existing_entries = {entry.name: entry for entry in it}
+            except FileNotFoundError:
+                existing_entries = {}
+
+            replaced = set()
+            skipped = set()
+
+            for info in members:
+                relative = info.filename[len(prefix):]
+                parts = relative.split('/')
+                top_name = parts[0]
+                if not top_name:
+                    continue
+
+                if '..' in parts or relative.startswith('/'):
+                    raise Exception(f"Unsafe path in backup archive: {info.filename}")
+
+                if top_name in self.exclude_files:
+                    if top_name not in skipped:
+                        print(f"[SKIP] Preserving existing {top_name}")
+                        skipped.add(top_name)
+                    continue
+
+                # Replace each top-level entry wholesale, as before
+                if top_name not in replaced:
+                    entry = existing_entries.get(top_name)
+                    if entry is not None:
+                        if entry.is_dir():
+                            shutil.rmtree(entry.path)
+                        else:
+                            os.unlink(entry.path)
+                    replaced.add(top_name)
+
+                target = self.ngcp_config_dir / relative
+                if info.is_dir():
+                    target.mkdir(parents=True, exist_ok=True)
+                    continue
+
+                target.parent.mkdir(parents=True, exist_ok=True)
+                with zipf.open(info) as src, open(target, 'wb') as dst:
+                    shutil.copyfileobj(src, dst, 1 << 20)
 
         print("[OK] ngcp-config restored")
 
-    def restore_mysql_database(self, restore_dir: Path):
+    def restore_mysql_database(self, zip_path: str):
         """
         Restore MySQL database from backup
 
+        database.sql is streamed from the archive into mysql's stdin.
+
         Args:
-            restore_dir: Directory containing extracted backup
+            zip_path: Path to the backup archive
 
         Raises:
             Exception: If restoration fails
         """
-        sql_file = restore_dir / "database.sql"
-        if not sql_file.exists():
-            raise Exception("database.sql missing from backup!")
-
         # Get MySQL credentials from config
         mysql_config = self.config.get('mysql', {})
         mysql_user = mysql_config.get('user', 'root')
@@ -349,13 +482,64 @@ class RestoreManager:
         self.logger.debug("Restoring MySQL database")
         print("[INFO] Restoring MySQL database...")
 
-        # Build mysql command with credentials
-        cmd = f"mysql -u {mysql_user}"
+        # Pass the password through the environment so it never shows up in
+        # the process table, and stream the dump straight into mysql's stdin
+        env = dict(os.environ)
         if mysql_password:
-            cmd += f" -p{mysql_password}"
-        cmd += f" < '{sql_file}'"
+            env['MYSQL_PWD'] = mysql_password
+
+        argv = ["mysql", "-u", mysql_user]
+
+        with zipfile.ZipFile(zip_path, 'r') as zipf:
+            try:
+                info = zipf.getinfo("database.sql")
+            except KeyError:
+                raise Exception("database.sql missing from backup!")
+
+            self.logger.debug(f"Running command: {shlex.join(argv)} < database.sql")
+            print(f">>> {shlex.join(argv)} < database.sql")
+
+            executable = shutil.which(argv[0])
+            if executable is None:
+                raise Exception(f"Command not found: {argv[0]}")
+
+            # stderr goes to a temp file so a chatty mysql can't block on a full pipe
+            with tempfile.TemporaryFile() as stderr_file, zipf.open(info) as src:
+                proc = subprocess.Popen(
+                    argv,
+                    stdin=subprocess.PIPE,
+                    stdout=subprocess.DEVNULL,
+                    stderr=stderr_file,
+                    env=env,
+                    executable=executable,
+                    close_fds=False
+                )
+                try:
+                    shutil.copyfileobj(src, proc.stdin, 1 << 20)
+                except BrokenPipeError:
+                    # mysql exited early; its return code and stderr say why
+                    pass
+                finally:
+                    try:
+                        proc.stdin.close()
+                    except BrokenPipeError:
+                        pass
+                returncode = proc.wait()
+
+                stderr_file.seek(0)
+                stderr = stderr_file.read().decode('utf-8', errors='replace')
+
+        if stderr:
+            for line in stderr.strip().split('\n'):
+                if line:
+                    self.logger.error(f"  stderr: {line}")
+                    print(f"[ERROR] {line}")
+
+        if returncode != 0:
+            error_msg = f"Command failed ({returncode}): mysql restore"
+            self.logger.error(error_msg)
+            raise RuntimeError(error_msg)
 
-        self._run_command(cmd)
         self.logger.success("MySQL database restored successfully")
         print("[OK] MySQL database restored")
 
@@ -376,7 +560,7 @@ class RestoreManager:
         self.logger.info(f"Running ngcpcfg apply: {commit_msg}")
 
         self._run_command(
-            f"ngcpcfg apply '{commit_msg}'",
+            ["ngcpcfg", "apply", commit_msg],
             log_description=f"ngcpcfg apply {stage if stage else 'final'}"
         )
 
@@ -408,22 +592,40 @@ class RestoreManager:
         print()
 
         original_key = None
-        restore_dir = None
 
         try:
-            # Step 1: Extract and save current SQL key if preserving
-            if preserve_sql_key:
-                print("[+] Step 1: Extracting current SQL encryption key from /etc/ngcp-config/constants.yml...")
-                self.logger.info("Extracting current SQL encryption key for preservation")
-                original_key = self.extract_key()
-                self.save_key_to_temp(original_key)
-                self.logger.debug(f"Saved encryption key to temp file: {self.tempkey_path}")
-                print()
-
-            # Step 2: Download backup to tmp
-            print(f"[+] Step 2: Downloading backup: {backup_filename}")
-            self.logger.info(f"Downloading backup file: {backup_filename}")
-            zip_path = self.storage.download_backup_to_tmp(backup_filename)
+            # Steps 1 and 2 are independent: download in a worker thread
+            # while the current key is extracted here
+            cancel_download = threading.Event()
+            with ThreadPoolExecutor(max_workers=1) as executor:
+                self.logger.info(f"Downloading backup file: {backup_filename}")
+                download_future = executor.submit(
+                    self.storage.download_backup_multipart, backup_filename, cancel=cancel_download
+                )
+
+                # Step 1: Extract and save current SQL key if preserving
+                try:
+                    if preserve_sql_key:
+                        print("[+] Step 1: Extracting current SQL encryption key from /etc/ngcp-config/constants.yml...")
+                        self.logger.info("Extracting current SQL encryption key for preservation")
+                        original_key = self.extract_key()
+                        self.save_key_to_temp(original_key)
+                        self.logger.debug(f"Saved encryption key to temp file: {self.tempkey_path}")
+                        print()
+                except Exception:
+                    # Fail now rather than after the whole download: stop the
+                    # transfer, wait for the worker, then drop the partial file
+                    cancel_download.set()
+                    executor.shutdown(wait=True, cancel_futures=True)
+                    try:
+                        os.remove(os.path.join(self.storage.tmp_dir, backup_filename))
+                    except FileNotFoundError:
+                        pass
+                    raise
+
+                # Step 2: Download backup to tmp
+                print(f"[+] Step 2: Downloading backup: {backup_filename}")
+                zip_path = download_future.result()
 
             if not zip_path:
                 error_msg = f"Failed to download backup: {backup_filename}"
@@ -434,32 +636,23 @@ class RestoreManager:
             print(f"    Downloaded to: {zip_path}")
             print()
 
-            # Step 3: Extract backup
-            print("[+] Step 3: Extracting backup archive...")
-            self.logger.info("Extracting backup archive")
-            restore_dir = self.tmp_dir / f"RESTORE-{Path(zip_path).stem}"
-
-            if restore_dir.exists():
-                shutil.rmtree(restore_dir)
-
-            restore_dir.mkdir(parents=True)
-
-            extract_path = self.storage.unzip_backup(zip_path, str(restore_dir))
-            self.logger.success(f"Extracted backup to: {extract_path}")
-            print(f"    Extracted to: {extract_path}")
+            # Step 3: Check backup archive
+            print("[+] Step 3: Checking backup archive...")
+            self.logger.info("Checking backup archive")
+            with zipfile.ZipFile(zip_path, 'r') as zipf:
+                names = zipf.namelist()
+            if "database.sql" not in names:
+                raise Exception("database.sql missing from backup!")
+            if not any(name.startswith("ngcp-config/") for name in names):
+                raise Exception("Backup missing ngcp-config/")
+            self.logger.success(f"Backup archive contains {len(names)} entries")
+            print(f"    Archive contains {len(names)} entries")
             print()
 
             # Step 4: Restore NGCP config (excluding network.yml)
             print("[+] Step 4: Restoring NGCP configuration to /etc/ngcp-config...")
             self.logger.info("Restoring NGCP configuration (excluding network.yml)")
-
-            # If extracted to subdirectory, adjust path
-            actual_restore_dir = Path(extract_path)
-            if not (actual_restore_dir / "ngcp-config").exists():
-                # Files might be directly in restore_dir
-                actual_restore_dir = restore_dir
-
-            self.restore_ngcp_config(actual_restore_dir)
+            self.restore_ngcp_config(zip_path)
             self.logger.success("NGCP configuration restored")
             print()
 
@@ -467,7 +660,7 @@ class RestoreManager:
             if preserve_sql_key and original_key:
                 print("[+] Step 5: Restoring original SQL encryption key to /etc/ngcp-config/constants.yml...")
                 self.logger.info("Restoring original SQL encryption key")
-                self.restore_key_into_constants()
+                self.restore_key_into_constants(original_key)
                 self.logger.success("SQL encryption key restored")
                 print()
             else:
@@ -495,7 +688,7 @@ class RestoreManager:
             # Step 8: Restore MySQL database
             print("[+] Step 8: Restoring MySQL database...")
             self.logger.info("Restoring MySQL database")
-            self.restore_mysql_database(actual_restore_dir)
+            self.restore_mysql_database(zip_path)
             print()
 
             # Step 9: Apply configuration - STAGE 2
@@ -530,7 +723,7 @@ class RestoreManager:
                     import time
                     time.sleep(5)
                     self.logger.info("Initiating system reboot")
-                    self._run_command("reboot", ignore_errors=True)
+                    self._run_command(["reboot"], ignore_errors=True)
                 except KeyboardInterrupt:
                     print()
                     print("[!] Reboot cancelled by user")
@@ -562,6 +755,11 @@ class RestoreManager:
 
             return False
 
+        finally:
+            # The manager is shared per config file; don't let a later
+            # restore_key_into_constants() call pick up this run's key
+            self._preserved_key = None
+
     def get_restore_status(self) -> Dict:
         """
         Get information about available backups for restore
@@ -579,6 +777,11 @@ class RestoreManager:
         }
 
 
+# Shared RestoreManager instances, one per config file
+_restore_managers: Dict[str, RestoreManager] = {}
+_restore_managers_lock = threading.Lock()
+
+
 # Convenience functions for external use
 def run_restore(
     backup_filename: str,
@@ -596,18 +799,26 @@ def run_restore(
     Returns:
         True if successful, False otherwise
     """
-    manager = RestoreManager()
+    manager = get_restore_manager()
     return manager.run_restore(backup_filename, preserve_sql_key, disable_firewall)
 
 
-def get_restore_manager() -> RestoreManager:
+def get_restore_manager(config_path: str = "/opt/sipwise-backup/config.yml") -> RestoreManager:
     """
-    Get a RestoreManager instance
+    Get the shared RestoreManager instance for a config file
+
+    Args:
+        config_path: Path to the configuration file
 
     Returns:
-        RestoreManager instance
+        RestoreManager instance (created on first use)
     """
-    return RestoreManager()
+    with _restore_managers_lock:
+        manager = _restore_managers.get(config_path)
+        if manager is None:
+            manager = RestoreManager(config_path)
+            _restore_managers[config_path] = manager
+        return manager
 
 
 if __name__ == "__main__":
@@ -4,14 +4,19 @@ scheduler.py - Scheduler Module for sipwise-backup
 Handles automatic backup scheduling, retention policy, and cleanup
 """
 
+import os
+import copy
 import time
 import json
+import bisect
+from operator import itemgetter
 from datetime import datetime, timedelta
 from pathlib import Path
-from typing import List, Dict
+from typing import List, Dict, NamedTuple, Optional, Tuple
 import sys
 import subprocess
 import shutil
+import threading
 
 # Import our modules
 from storage import StorageManager
@@ -19,6 +24,43 @@ from backup import BackupManager
 from logger import get_logger
 from emailer import get_emailer
 
+# orjson is optional; fall back to the stdlib encoder when it isn't installed
+try:
+    import orjson
+
+    def _json_dumps(data) -> bytes:
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2)
+
+    _json_loads = orjson.loads
+except ImportError:
+    def _json_dumps(data) -> bytes:
+        return json.dumps(data, indent=2).encode('utf-8')
+
+    def _json_loads(data: bytes):
+        # State is always written as UTF-8, so skip json's encoding detection
+        return json.loads(data.decode('utf-8'))
+
+# Minimum seconds between scheduler state writes (unless forced)
+STATE_FLUSH_INTERVAL = 5
+
+# Seconds between checks of config.yml for changes
+CONFIG_CHECK_INTERVAL = 300
+
+# Longest the scheduler loop sleeps before re-evaluating its deadlines
+MAX_SLEEP_SECONDS = 60
+
+# Seconds per supported backup frequency unit
+FREQUENCY_UNIT_SECONDS = {'minutes': 60, 'hours': 3600}
+
+
+class _ScheduleView(NamedTuple):
+    """Scheduler settings resolved once per config load"""
+    automatic_enabled: bool
+    frequency_seconds: int
+    reboot_enabled: bool
+    reboot_day: Optional[int]
+    reboot_hour: Optional[int]  # None if the configured day or time is missing or invalid
+    reboot_minute: Optional[int]
 
 
 class BackupScheduler:
@@ -35,13 +77,25 @@ class BackupScheduler:
         self.storage = StorageManager(config_path)
         self.backup_manager = BackupManager(config_path)
         self.config = self.storage.config
+        self._config_mtime = self._get_config_mtime()
         self.running = False
         self.last_reboot_month = None  # Track last reboot to prevent duplicates
+        self._wake = threading.Event()  # Set by stop() to interrupt the loop's sleep
         self.logger = get_logger(config_path)
         self.emailer = get_emailer(config_path)
         self.state_dir = Path("/opt/sipwise-backup/state")
         self.state_file = self.state_dir / "scheduler_state.json"
+        self._state_cache = None  # Last state read or written
+        self._state_mtime = -1  # st_mtime_ns of the state file when cached
+        self._state_dirty = False  # In-memory state not yet written to disk
+        self._last_flush = 0.0  # time.monotonic() of the last state write
+        self._min_backup_ts = None  # Oldest automatic backup seen by retention, None if unknown
+        self._print_status_needed = True  # Print the schedule summary on the next enabled tick
         self._ensure_state_dir()
+        self._refresh_schedule_state()
+        self._reboot_cmd = self._find_reboot_command()
+        if not self._reboot_cmd:
+            self.logger.warn("Reboot command not found; scheduled reboots will fail")
         self.logger.info("BackupScheduler initialized")
 
     def _ensure_state_dir(self):
@@ -49,23 +103,158 @@ class BackupScheduler:
         self.state_dir.mkdir(parents=True, exist_ok=True)
 
     def _load_state(self) -> dict:
-        """Load scheduler state from file"""
+        """
+        Load scheduler state from file
+
+        The parsed state is cached against the file's mtime, so the JSON is
+        only decoded again when the file has actually changed.
+        """
+        # Unflushed in-memory state is authoritative
+        if self._state_dirty:
+            return copy.copy(self._state_cache)
+
         try:
-            if self.state_file.exists():
-                with open(self.state_file, 'r') as f:
-                    return json.load(f)
+            try:
+                mtime = self.state_file.stat().st_mtime_ns
+            except FileNotFoundError:
+                return {}
+
+            if mtime == self._state_mtime and self._state_cache is not None:
+                return copy.copy(self._state_cache)
+
+            state = _json_loads(self.state_file.read_bytes())
+            self._state_cache = state
+            self._state_mtime = mtime
+            return copy.copy(state)
         except Exception as e:
             self.logger.warn(f"Could not load state file: {e}")
         return {}
 
     def _save_state(self, state: dict):
         """Save scheduler state to file"""
+        self._state_cache = copy.copy(state)
+        # Write to a temp file and rename it over the target, so a crash
+        # mid-write can never leave a truncated state file behind
+        tmp_file = self.state_file.with_suffix('.json.tmp')
         try:
-            with open(self.state_file, 'w') as f:
-                json.dump(state, f, indent=2)
+            with open(tmp_file, 'wb') as f:
+                f.write(_json_dumps(state))
+                f.flush()
+                os.fsync(f.fileno())
+                mtime = os.fstat(f.fileno()).st_mtime_ns
+            os.replace(tmp_file, self.state_file)
+            self._state_mtime = mtime
+            self._state_dirty = False
+            self._last_flush = time.monotonic()
         except Exception as e:
+            try:
+                tmp_file.unlink()
+            except OSError:
+                pass
+            # Keep the state pending so a later flush retries the write
+            self._state_dirty = True
             self.logger.error(f"Could not save state file: {e}")
 
+    def _mark_state(self, state: dict):
+        """
+        Record new scheduler state in memory
+
+        The state is written out by _flush_state, so bursts of updates
+        coalesce into a single disk write.
+        """
+        self._state_cache = copy.copy(state)
+        self._state_dirty = True
+        self._flush_state()
+
+    def _flush_state(self, force: bool = False):
+        """
+        Write pending state to disk
+
+        Args:
+            force: Write even if the last write was less than
+                STATE_FLUSH_INTERVAL seconds ago
+        """
+        if not self._state_dirty:
+            return
+        if not force and time.monotonic() - self._last_flush < STATE_FLUSH_INTERVAL:
+            return
+        self._save_state(self._state_cache)
+
+    def _get_config_mtime(self) -> int:
+        """Return the config file's mtime in nanoseconds, or -1 if it can't be read"""
+        try:
+            return os.stat(self.config_path).st_mtime_ns
+        except OSError:
+            return -1
+
+    def _config_changed(self) -> bool:
+        """Check whether the config file was modified since it was last loaded"""
+        mtime = self._get_config_mtime()
+        if mtime == self._config_mtime:
+            return False
+        self._config_mtime = mtime
+        return True
+
+    def _reload_managers(self):
+        """
+        Recreate the storage and backup managers from the current config file
+
+        StorageManager resolves the storage type, directories and compression
+        level once, so a config change needs new instances. The old FTP
+        sessions are closed first.
+        """
+        self.storage.close_ftp_session()
+        self.backup_manager.storage.close_ftp_session()
+        self.storage = StorageManager(self.config_path)
+        self.backup_manager = BackupManager(self.config_path)
+        self.config = self.storage.config
+
+    def _refresh_schedule_state(self):
+        """Resolve schedule settings once per config load for the scheduler loop"""
+        reboot_enabled = self.is_automatic_reboot_enabled()
+        schedule = self.get_reboot_schedule()
+
+        # Parse and validate the reboot time here rather than on every tick
+        reboot_hour = reboot_minute = None
+        scheduled_time = schedule.get('time')
+        if not scheduled_time:
+            if reboot_enabled:
+                print("[ERROR] Reboot time not configured")
+        else:
+            try:
+                hour, minute = map(int, scheduled_time.split(':'))
+                if 0 <= hour <= 23 and 0 <= minute <= 59:
+                    reboot_hour, reboot_minute = hour, minute
+                elif reboot_enabled:
+                    print(f"[ERROR] Invalid reboot time in config: {scheduled_time}")
+            except (ValueError, AttributeError):
+                if reboot_enabled:
+                    print(f"[ERROR] Invalid reboot time format in config: {scheduled_time}")
+
+        # A bad day would otherwise fail datetime() on every tick
+        reboot_day = schedule['day_of_month']
+        if isinstance(reboot_day, bool) or not isinstance(reboot_day, int) or not 1 <= reboot_day <= 31:
+            if reboot_enabled:
+                print(f"[ERROR] Invalid reboot day_of_month in config: {reboot_day!r}")
+            reboot_day = reboot_hour = reboot_minute = None
+
+        # server_name may have changed, so the cached oldest backup no longer applies
+        self._min_backup_ts = None
+
+        self._sched_cache = _ScheduleView(
+            automatic_enabled=self.is_automatic_backup_enabled(),
+            frequency_seconds=self.get_backup_frequency_seconds(),
+            reboot_enabled=reboot_enabled,
+            reboot_day=reboot_day,
+            reboot_hour=reboot_hour,
+            reboot_minute=reboot_minute
+        )
+
+    def _schedule_settings(self) -> Tuple[dict, dict]:
+        """Return the raw automatic backup and reboot config sections"""
+        automatic_config = self.config.get('backup', {}).get('automatic', {})
+        return automatic_config, self.config.get('reboot', {})
+
     def is_automatic_backup_enabled(self) -> bool:
         """
         Check if automatic backups are enabled
@@ -91,13 +280,8 @@ class BackupScheduler:
         value = frequency_config.get('value', 1)
         unit = frequency_config.get('unit', 'hours')
 
-        if unit == 'minutes':
-            return value * 60
-        elif unit == 'hours':
-            return value * 60 * 60
-        else:
-            # Default to hours
-            return value * 60 * 60
+        # Unknown units default to hours
+        return value * FREQUENCY_UNIT_SECONDS.get(unit, 3600)
 
     def is_automatic_reboot_enabled(self) -> bool:
         """
@@ -130,33 +314,59 @@ class BackupScheduler:
         Returns:
             True if current date/time matches the reboot schedule
         """
-        schedule = self.get_reboot_schedule()
-        now = datetime.now()
-        
-        # Check if today is the scheduled day of month
-        if now.day != schedule['day_of_month']:
-            return False
-        
-        # Parse scheduled time with validation
-        scheduled_time = schedule.get('time')
-        if not scheduled_time:
-            print("[ERROR] Reboot time not configured")
+        cache = self._sched_cache
+        if cache.reboot_hour is None:
+            # Missing or invalid day/time (reported when the config was loaded)
             return False
-            
-        try:
-            scheduled_hour, scheduled_minute = map(int, scheduled_time.split(':'))
-            if not (0 <= scheduled_hour <= 23 and 0 <= scheduled_minute <= 59):
-                print(f"[ERROR] Invalid reboot time in config: {scheduled_time}")
-                return False
-        except (ValueError, AttributeError):
-            print(f"[ERROR] Invalid reboot time format in config: {scheduled_time}")
-            return False
-        
-        # Check if current time matches (within the current minute)
-        if now.hour == scheduled_hour and now.minute == scheduled_minute:
-            return True
-        
-        return False
+
+        # Check if current day and time match (within the current minute)
+        now = datetime.now()
+        return (
+            now.day == cache.reboot_day and
+            now.hour == cache.reboot_hour and
+            now.minute == cache.reboot_minute
+        )
+
+    def _seconds_until_reboot_window(self) -> Optional[float]:
+        """
+        Get the time until the next scheduled reboot minute starts
+
+        Returns:
+            Seconds until the reboot window (0 while inside it), or None if
+            automatic reboots are disabled or the schedule is invalid
+        """
+        cache = self._sched_cache
+        if not cache.reboot_enabled or cache.reboot_hour is None:
+            return None
+
+        now = datetime.now()
+        year, month = now.year, now.month
+        # Months without the configured day (e.g. the 31st) are skipped
+        for _ in range(12):
+            try:
+                window = datetime(year, month, cache.reboot_day, cache.reboot_hour, cache.reboot_minute)
+            except ValueError:
+                window = None
+            if window is not None and window + timedelta(minutes=1) > now:
+                return max(0.0, (window - now).total_seconds())
+            year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+        return None
+
+    @staticmethod
+    def _find_reboot_command() -> Optional[str]:
+        """
+        Find the reboot command path dynamically for cross-platform support
+
+        Returns:
+            Path to the reboot command, or None if it can't be found
+        """
+        reboot_cmd = shutil.which('reboot')
+        if not reboot_cmd:
+            # Try common paths as fallback
+            for path in ['/sbin/reboot', '/usr/sbin/reboot']:
+                if Path(path).exists():
+                    return path
+        return reboot_cmd
 
     def perform_reboot(self):
         """
@@ -171,21 +381,16 @@ class BackupScheduler:
         # This will be checked on next startup to send success email
         state = self._load_state()
         state['pending_reboot_notification'] = time.time()
-        self._save_state(state)
+        self._mark_state(state)
+        # Commit state to disk before the reboot is started
+        self._flush_state(force=True)
         self.logger.info("Saved pending reboot notification state")
         
         print("[!] Initiating system reboot...")
         print("=" * 80)
         
-        # Find the reboot command path dynamically for cross-platform support
-        reboot_cmd = shutil.which('reboot')
-        if not reboot_cmd:
-            # Try common paths as fallback
-            for path in ['/sbin/reboot', '/usr/sbin/reboot']:
-                if Path(path).exists():
-                    reboot_cmd = path
-                    break
-        
+        # Resolved once in __init__
+        reboot_cmd = self._reboot_cmd
         if not reboot_cmd:
             error_msg = "Reboot command not found on this system"
             self._handle_reboot_error(error_msg)
@@ -211,13 +416,49 @@ class BackupScheduler:
         self.logger.error(error_msg)
         self.emailer.send_reboot_failure(error_message=error_msg)
 
-    def apply_retention_policy(self) -> int:
+    @staticmethod
+    def _write_lines(lines: List[str]):
+        """Write several console lines to stdout in a single call"""
+        if lines:
+            sys.stdout.write("\n".join(lines) + "\n")
+            sys.stdout.flush()
+
+    @staticmethod
+    def _partition_backups(backups: List[Dict], server_name: str) -> Tuple[List[Dict], int, int]:
+        """
+        Split a backup list in a single pass
+
+        Args:
+            backups: Backup metadata from storage
+            server_name: Name of the current server
+
+        Returns:
+            Tuple of (automatic/unknown backups for this server,
+            number of backups from other servers, number of manual backups)
+        """
+        auto_backups = []
+        other_server_count = 0
+        manual_count = 0
+        for backup in backups:
+            if backup.get('server_name') != server_name:
+                other_server_count += 1
+            elif backup.get('type', 'unknown') == 'manual':
+                manual_count += 1
+            else:
+                auto_backups.append(backup)
+        return auto_backups, other_server_count, manual_count
+
+    def apply_retention_policy(self, backups: List[Dict] = None) -> int:
         """
         Apply retention policy to delete old backups
 
         Deletes automatic and unknown backups older than the configured retention days.
         Manual backups are exempt from retention policy.
         Only applies to backups matching the current server name.
+
+        Args:
+            backups: Pre-fetched backup list (fetched from storage if None).
+                Deleted entries are removed from this list in place.
         
         Returns:
             Number of backups deleted
@@ -230,50 +471,75 @@ class BackupScheduler:
         self.logger.info(f"Applying retention policy (keep last {retention_days} days)")
         print(f"[+] Applying retention policy (keep last {retention_days} days)")
 
+        # Calculate cutoff date
+        cutoff_date = datetime.now() - timedelta(days=retention_days)
+        cutoff_ts = cutoff_date.timestamp()
+
+        # Nothing can have expired if the oldest known backup is newer than the cutoff
+        if self._min_backup_ts is not None and self._min_backup_ts > cutoff_ts:
+            self.logger.debug("No backups old enough for retention, skipping")
+            print("    No old backups to delete")
+            self.logger.apply_retention_policy()
+            return 0
+
         # Get all backups
-        backups = self.storage.list_backups()
+        if backups is None:
+            backups = self.storage.list_backups()
 
         if not backups:
             self.logger.debug("No backups to process")
             print("    No backups to process")
-            return
+            return 0
+
+        # Split into this server's automatic backups and counts of the rest
+        auto_backups, other_server_count, skipped_manual_count = self._partition_backups(
+            backups, current_server_name
+        )
 
-        # Filter backups to only those matching current server name
-        matching_backups = [b for b in backups if b.get('server_name') == current_server_name]
-        other_server_count = len(backups) - len(matching_backups)
-        
         if other_server_count > 0:
             self.logger.debug(f"Skipping {other_server_count} backup(s) from other servers")
             print(f"    Skipping {other_server_count} backup(s) from other servers")
 
-        if not matching_backups:
+        if not auto_backups and not skipped_manual_count:
             self.logger.debug("No backups matching current server name")
             print("    No backups matching current server name")
-            return
+            return 0
 
-        # Calculate cutoff date
-        cutoff_date = datetime.now() - timedelta(days=retention_days)
         self.logger.debug(f"Cutoff date: {cutoff_date.strftime('%d/%m/%Y %H:%M')}")
         print(f"    Cutoff date: {cutoff_date.strftime('%d/%m/%Y %H:%M')}")
 
+        # Sort oldest first so everything before the cutoff is a single slice;
+        # comparing float timestamps is cheaper than comparing datetimes
+        auto_backups.sort(key=itemgetter('ts'))
+        timestamps = [b['ts'] for b in auto_backups]
+        split_index = bisect.bisect_left(timestamps, cutoff_ts)
+
+        # Remember the oldest backup that survives so later runs can skip early
+        self._min_backup_ts = timestamps[split_index] if split_index < len(timestamps) else None
+
         # Find backups to delete
-        deleted_count = 0
-        skipped_manual_count = 0
-        for backup in matching_backups:
-            backup_date = backup['datetime']
-            backup_type = backup.get('type', 'unknown')
-            
-            # Skip manual backups - they are exempt from retention policy
-            if backup_type == 'manual':
-                skipped_manual_count += 1
-                continue
-            
-            if backup_date < cutoff_date:
-                filename = backup['filename']
+        to_delete = []
+        messages = []
+        debug_enabled = self.logger.is_debug_enabled()
+        for backup in auto_backups[:split_index]:
+            filename = backup['filename']
+            if debug_enabled:
                 self.logger.debug(f"Deleting old backup: {filename}")
-                print(f"    Deleting old backup: {filename}")
-                if self.storage.delete_backup(filename):
-                    deleted_count += 1
+            messages.append(f"    Deleting old backup: {filename}")
+            to_delete.append(filename)
+
+        # One write for the whole list instead of a print() per file
+        self._write_lines(messages)
+
+        deleted_count = self.storage.delete_backups(to_delete)
+        if deleted_count < len(to_delete):
+            # Some expired backups are still there; don't trust the cached minimum
+            self._min_backup_ts = None
+
+        # Keep the caller's list in sync so later policies don't see deleted files
+        if to_delete:
+            deleted_names = set(to_delete)
+            backups[:] = [b for b in backups if b['filename'] not in deleted_names]
 
         if skipped_manual_count > 0:
             self.logger.debug(f"Skipped {skipped_manual_count} manual backup(s) (exempt from retention)")
@@ -290,7 +556,7 @@ class BackupScheduler:
         
         return deleted_count
 
-    def apply_cleanup_policy(self) -> int:
+    def apply_cleanup_policy(self, backups: List[Dict] = None) -> int:
         """
         Apply cleanup policy to keep only last backup per day
 
@@ -301,6 +567,9 @@ class BackupScheduler:
         - For previous days: keeps only the last (most recent) backup
         - Deletes all other backups from previous days
         - Only applies to backups matching the current server name
+
+        Args:
+            backups: Pre-fetched backup list (fetched from storage if None)
         
         Returns:
             Number of backups deleted
@@ -325,36 +594,28 @@ class BackupScheduler:
         print("[+] Applying cleanup policy (last per day)")
 
         # Get all backups
-        backups = self.storage.list_backups()
+        if backups is None:
+            backups = self.storage.list_backups()
 
         if not backups:
             self.logger.debug("No backups to process")
             print("    No backups to process")
             return 0
 
-        # Filter backups to only those matching current server name
-        matching_backups = [b for b in backups if b.get('server_name') == current_server_name]
-        other_server_count = len(backups) - len(matching_backups)
-        
+        # Split into this server's automatic backups and counts of the rest
+        auto_backups, other_server_count, manual_count = self._partition_backups(
+            backups, current_server_name
+        )
+
         if other_server_count > 0:
             self.logger.debug(f"Skipping {other_server_count} backup(s) from other servers")
             print(f"    Skipping {other_server_count} backup(s) from other servers")
 
-        if not matching_backups:
+        if not auto_backups and not manual_count:
             self.logger.debug("No backups matching current server name")
             print("    No backups matching current server name")
             return 0
 
-        # Filter out manual backups - they are exempt from cleanup
-        auto_backups = []
-        manual_count = 0
-        for backup in matching_backups:
-            backup_type = backup.get('type', 'unknown')
-            if backup_type == 'manual':
-                manual_count += 1
-            else:
-                auto_backups.append(backup)
-
         if manual_count > 0:
             self.logger.debug(f"Excluding {manual_count} manual backup(s) from cleanup")
             print(f"    Excluding {manual_count} manual backup(s) from cleanup")
@@ -364,42 +625,43 @@ class BackupScheduler:
             print("    No automatic backups to process")
             return 0
 
-        # Group backups by date (day)
-        backups_by_day = {}
-        for backup in auto_backups:
-            backup_date = backup['datetime']
-            day_key = backup_date.strftime('%Y-%m-%d')
-
-            if day_key not in backups_by_day:
-                backups_by_day[day_key] = []
+        # Get today's date for comparison
+        today_key = datetime.now().date()
 
-            backups_by_day[day_key].append(backup)
-
-        # Get today's date string for comparison
-        today_key = datetime.now().strftime('%Y-%m-%d')
+        # Single pass: track the newest backup per day and collect the rest
+        newest_by_day = {}
+        losers = []
+        for backup in auto_backups:
+            day_key = backup['datetime'].date()
 
-        # For each day, keep only the last backup
-        deleted_count = 0
-        for day_key, day_backups in backups_by_day.items():
             # Skip the current day - only cleanup previous days
             if day_key == today_key:
                 continue
-            if len(day_backups) <= 1:
-                # Only one backup for this day, keep it
-                continue
 
-            # Sort by datetime, newest first
-            day_backups.sort(key=lambda x: x['datetime'], reverse=True)
+            previous = newest_by_day.get(day_key)
+            if previous is None:
+                newest_by_day[day_key] = backup
+            elif backup['ts'] > previous['ts']:
+                losers.append((day_key, previous))
+                newest_by_day[day_key] = backup
+            else:
+                losers.append((day_key, backup))
+
+        # Delete everything except the newest backup of each day
+        to_delete = []
+        messages = []
+        debug_enabled = self.logger.is_debug_enabled()
+        for day_key, backup in losers:
+            filename = backup['filename']
+            message = f"Deleting duplicate backup for {day_key.isoformat()}: {filename}"
+            if debug_enabled:
+                self.logger.debug(message)
+            messages.append("    " + message)
+            to_delete.append(filename)
 
-            # Keep the first (newest), delete the rest
-            backups_to_delete = day_backups[1:]
+        self._write_lines(messages)
 
-            for backup in backups_to_delete:
-                filename = backup['filename']
-                self.logger.debug(f"Deleting duplicate backup for {day_key}: {filename}")
-                print(f"    Deleting duplicate backup for {day_key}: {filename}")
-                if self.storage.delete_backup(filename):
-                    deleted_count += 1
+        deleted_count = self.storage.delete_backups(to_delete)
 
         if deleted_count > 0:
             self.logger.info(f"Deleted {deleted_count} duplicate backup(s)")
@@ -427,18 +689,20 @@ class BackupScheduler:
             self.logger.success(f"Scheduled backup completed: {result}")
             print(f"\n[OK] Scheduled backup completed: {result}")
 
+            # List backups once and share the result between both policies.
+            # Without cleanup, retention may skip listing altogether.
+            backup_config = self.config.get('backup', {})
+            cleanup_config = backup_config.get('cleanup', {})
+            cleanup_enabled = cleanup_config.get('enabled', False)
+            backups = self.storage.list_backups() if cleanup_enabled else None
+
             # Apply retention policy
             print()
-            retention_deleted = self.apply_retention_policy()
+            retention_deleted = self.apply_retention_policy(backups=backups)
 
             # Apply cleanup policy
             print()
-            cleanup_deleted = self.apply_cleanup_policy()
-            
-            # Check if cleanup is enabled
-            backup_config = self.config.get('backup', {})
-            cleanup_config = backup_config.get('cleanup', {})
-            cleanup_enabled = cleanup_config.get('enabled', False)
+            cleanup_deleted = self.apply_cleanup_policy(backups=backups)
             
             # Send success email with maintenance info
             total_deleted = retention_deleted + cleanup_deleted
@@ -478,73 +742,95 @@ class BackupScheduler:
         print("=" * 80)
 
         self.running = True
+        self._wake.clear()
         
         # Load state from file
         state = self._load_state()
         last_backup_time = state.get('last_backup_time')  # Can be None or timestamp
         self.last_reboot_month = state.get('last_reboot_month')
         
-        # Check for pending reboot notification from before reboot
-        pending_reboot_time = state.get('pending_reboot_notification')
-        if pending_reboot_time:
-            self.logger.info("Found pending reboot notification, sending success email")
-            reboot_datetime = datetime.fromtimestamp(pending_reboot_time)
-            
-            # Send the success email
-            self.emailer.send_reboot_success(reboot_initiated_at=reboot_datetime)
-            
+        # Check for pending reboot notification from before reboot.
+        # State is only rewritten when there actually was one to clear.
+        pending_reboot_time = state.pop('pending_reboot_notification', None)
+        if pending_reboot_time is not None:
+            if pending_reboot_time:
+                self.logger.info("Found pending reboot notification, sending success email")
+                reboot_datetime = datetime.fromtimestamp(pending_reboot_time)
+
+                # Send the success email
+                self.emailer.send_reboot_success(reboot_initiated_at=reboot_datetime)
+                self.logger.success("Reboot success notification sent")
+
             # Clear the pending notification
-            state.pop('pending_reboot_notification', None)
-            self._save_state(state)
-            self.logger.success("Reboot success notification sent")
+            self._mark_state(state)
         
         if last_backup_time:
             self.logger.info(f"Loaded last backup time from state: {datetime.fromtimestamp(last_backup_time)}")
-        
-        last_config_check = time.time()
-        config_check_interval = 300  # Check config every 5 minutes
+
+        # Deadlines are tracked on the monotonic clock; wall-clock time is only
+        # used for the persisted last_backup_time
+        last_backup_mono = None
+        if last_backup_time:
+            last_backup_mono = time.monotonic() - (time.time() - last_backup_time)
+        last_config_check = time.monotonic()
 
         while self.running:
             try:
-                current_time = time.time()
-
-                # Periodically reload config to check if settings changed
-                if current_time - last_config_check >= config_check_interval:
-                    self.config = self.storage._load_config()
-                    last_config_check = current_time
+                # One clock reading per tick keeps every decision on the same timeline
+                now_mono = time.monotonic()
+                now_dt = datetime.now()
+
+                # Write out any state update that was deferred by the debounce
+                self._flush_state()
+
+                # Periodically reload config if the file has changed
+                if now_mono - last_config_check >= CONFIG_CHECK_INTERVAL:
+                    if self._config_changed():
+                        previous_schedule = self._schedule_settings()
+                        self._reload_managers()
+                        self._refresh_schedule_state()
+                        # Only re-print the summary when the schedule itself changed
+                        if self._schedule_settings() != previous_schedule:
+                            self._print_status_needed = True
+                    last_config_check = now_mono
+
+                automatic_enabled = self._sched_cache.automatic_enabled
+                frequency_seconds = self._sched_cache.frequency_seconds
 
                 # Check if automatic backups are enabled
-                if not self.is_automatic_backup_enabled():
+                if not automatic_enabled:
                     # Automatic backups disabled - idle
-                    if current_time - last_config_check < 10:  # Just checked
+                    if now_mono - last_config_check < 10:  # Just checked
                         print("Automatic backups are DISABLED in config")
                         print("Service will idle and check config periodically")
                         print("=" * 80)
 
-                    # Sleep for a minute before checking again
-                    time.sleep(60)
+                    # Sleep until the next config check
+                    next_config_in = last_config_check + CONFIG_CHECK_INTERVAL - time.monotonic()
+                    self._wake.wait(timeout=min(MAX_SLEEP_SECONDS, max(1, next_config_in)))
                     continue
 
-                # Automatic backups enabled - run scheduler
-                frequency_seconds = self.get_backup_frequency_seconds()
-
-                # Print status on first run or after config change
-                if last_backup_time is None:
-                    backup_config = self.config.get('backup', {})
-                    automatic_config = backup_config.get('automatic', {})
-                    frequency_config = automatic_config.get('frequency', {})
+                # Print status on startup or after the schedule config changed
+                if self._print_status_needed:
+                    self._print_status_needed = False
+                    frequency_config = self._schedule_settings()[0].get('frequency', {})
                     value = frequency_config.get('value', 1)
                     unit = frequency_config.get('unit', 'hours')
 
+                    if last_backup_mono is None:
+                        next_backup_in = frequency_seconds
+                    else:
+                        next_backup_in = max(0, last_backup_mono + frequency_seconds - now_mono)
+
                     self.logger.info("Automatic backups ENABLED")
                     self.logger.debug(f"Frequency: {frequency_seconds} seconds")
                     print(f"Automatic backups ENABLED")
                     print(f"Frequency: Every {value} {unit} ({frequency_seconds} seconds)")
-                    print(f"Next backup: {(datetime.now() + timedelta(seconds=frequency_seconds)).strftime('%d/%m/%Y %H:%M:%S')}")
+                    print(f"Next backup: {(now_dt + timedelta(seconds=next_backup_in)).strftime('%d/%m/%Y %H:%M:%S')}")
                     print()
                     
                     # Print reboot schedule status
-                    if self.is_automatic_reboot_enabled():
+                    if self._sched_cache.reboot_enabled:
                         reboot_schedule = self.get_reboot_schedule()
                         print(f"Automatic reboot ENABLED")
                         print(f"Schedule: Day {reboot_schedule['day_of_month']} of each month at {reboot_schedule['time']}")
@@ -553,29 +839,32 @@ class BackupScheduler:
                     print("=" * 80)
 
                 # Check if it's time for a backup
-                if last_backup_time is None or (current_time - last_backup_time) >= frequency_seconds:
+                if last_backup_mono is None or (now_mono - last_backup_mono) >= frequency_seconds:
                     # Run scheduled backup
                     self.run_scheduled_backup()
-                    last_backup_time = current_time
+                    last_backup_mono = now_mono
+                    last_backup_time = time.time() - (time.monotonic() - now_mono)
                     
                     # Save state after backup (preserve pending_reboot_notification if it exists)
                     state = self._load_state()
                     state['last_backup_time'] = last_backup_time
                     state['last_reboot_month'] = self.last_reboot_month
-                    self._save_state(state)
+                    self._mark_state(state)
 
-                    # Recalculate frequency in case config changed
-                    frequency_seconds = self.get_backup_frequency_seconds()
+                    # A backup can take minutes, so re-read the clock for the rest of the tick
+                    now_dt = datetime.now()
 
                     # Calculate next backup time
-                    next_backup = datetime.now() + timedelta(seconds=frequency_seconds)
+                    next_backup = now_dt + timedelta(seconds=frequency_seconds)
                     print(f"\nNext backup: {next_backup.strftime('%d/%m/%Y %H:%M:%S')}")
 
-                # Check for scheduled reboot
-                if self.is_automatic_reboot_enabled():
-                    if self.should_reboot_now():
+                # Check for scheduled reboot. The cached schedule is compared
+                # inline; reboot_hour is None when the configured day or time is invalid.
+                cache = self._sched_cache
+                if cache.reboot_enabled and now_dt.day == cache.reboot_day:
+                    if now_dt.hour == cache.reboot_hour and now_dt.minute == cache.reboot_minute:
                         # Check if we already rebooted this month
-                        current_month_key = datetime.now().strftime('%Y-%m')
+                        current_month_key = f"{now_dt.year:04d}-{now_dt.month:02d}"
                         if self.last_reboot_month != current_month_key:
                             # Update tracking before reboot to prevent race condition
                             self.last_reboot_month = current_month_key
@@ -583,11 +872,24 @@ class BackupScheduler:
                             state = self._load_state()
                             state['last_backup_time'] = last_backup_time
                             state['last_reboot_month'] = self.last_reboot_month
-                            self._save_state(state)
+                            self._mark_state(state)
                             self.perform_reboot()
 
-                # Sleep for a minute before checking again
-                time.sleep(60)
+                # Sleep until the earliest of: next config check, next backup,
+                # start of the reboot window and the pending state flush.
+                # Capped so the loop still re-evaluates at least once a minute.
+                now_mono = time.monotonic()
+                deadlines = [
+                    MAX_SLEEP_SECONDS,
+                    last_config_check + CONFIG_CHECK_INTERVAL - now_mono,
+                    last_backup_mono + frequency_seconds - now_mono,
+                ]
+                reboot_in = self._seconds_until_reboot_window()
+                if reboot_in is not None and reboot_in > 0:
+                    deadlines.append(reboot_in)
+                if self._state_dirty:
+                    deadlines.append(STATE_FLUSH_INTERVAL)
+                self._wake.wait(timeout=max(1, min(deadlines)))
 
             except KeyboardInterrupt:
                 print("\n\nScheduler interrupted, stopping...")
@@ -596,7 +898,11 @@ class BackupScheduler:
             except Exception as e:
                 print(f"\n[ERROR] Scheduler error: {e}")
                 print("Sleeping for 5 minutes before retry...")
-                time.sleep(300)
+                self._wake.wait(timeout=300)
+
+        self._flush_state(force=True)
+        self.storage.close_ftp_session()
+        self.backup_manager.storage.close_ftp_session()
 
         print("\n" + "=" * 80)
         print("Sipwise Backup Scheduler Stopped")
@@ -605,16 +911,40 @@ class BackupScheduler:
     def stop(self):
         """Stop the scheduler"""
         self.running = False
+        self._wake.set()
+
+
+# Shared BackupScheduler instances, one per config file
+_schedulers: Dict[str, BackupScheduler] = {}
+_schedulers_lock = threading.Lock()
 
 
 # Convenience functions
+def get_scheduler(config_path: str = "/opt/sipwise-backup/config.yml") -> BackupScheduler:
+    """
+    Get the shared BackupScheduler instance for a config file
+
+    Args:
+        config_path: Path to the configuration file
+
+    Returns:
+        BackupScheduler instance (created on first use)
+    """
+    with _schedulers_lock:
+        scheduler = _schedulers.get(config_path)
+        if scheduler is None:
+            scheduler = BackupScheduler(config_path)
+            _schedulers[config_path] = scheduler
+        return scheduler
+
+
 def run_scheduler():
     """
     Run the backup scheduler
 
     This is the main entry point when running as a service
     """
-    scheduler = BackupScheduler()
+    scheduler = get_scheduler()
     scheduler.run()
 
 
@@ -624,7 +954,7 @@ def apply_retention_and_cleanup():
 
     Useful for testing or manual cleanup
     """
-    scheduler = BackupScheduler()
+    scheduler = get_scheduler()
 
     print("=" * 80)
     print("Applying Retention and Cleanup Policies")
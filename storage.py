@@ -3,21 +3,319 @@
 storage.py - Storage Module for sipwise-backup
 Handles all storage and filesystem operations including:
 - Reading/writing backup files
-- Zipping/unzipping operations
+- Zipping operations
 - Local and FTP storage
 - Backup naming and listing
 """
 
 import os
+import re
+import functools
+import glob
+import time
+import pickle
+import threading
 import yaml
 import zipfile
+import zlib
 import shutil
+import socket
+import stat
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from datetime import datetime
 from ftplib import FTP, error_perm
-from typing import List, Dict, Optional, Tuple
+from operator import itemgetter
+from types import MappingProxyType
+from typing import Callable, Iterator, List, Dict, Mapping, Optional, Tuple
 
 from logger import get_logger
 
+# fcntl is POSIX-only; without it reflink copies are simply skipped
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# ioctl request number for reflinking one file into another (linux/fs.h)
+FICLONE = getattr(fcntl, 'FICLONE', 0x40049409)
+
+# libdeflate (via the optional 'deflate' package) compresses faster than zlib
+try:
+    import deflate
+except ImportError:
+    deflate = None
+
+# Use the libyaml C parser when PyYAML was built with it
+try:
+    from yaml import CSafeLoader as _SafeLoader
+except ImportError:
+    from yaml import SafeLoader as _SafeLoader
+
+# Remote backups smaller than this are downloaded over a single connection
+MULTIPART_MIN_SIZE = 16 * 1024 * 1024
+
+# Parallel FTP transfers per download when storage.remote.download_parts is unset
+DEFAULT_DOWNLOAD_PARTS = 4
+
+# Suffix of the pickled copy of config.yml written by _load_config()
+CONFIG_CACHE_SUFFIX = '.pkl'
+
+# Backup name without extension: <server>-<instance>[-<type>]-HH-MM_DD-MM-YYYY.
+# The prefix group must contain at least one hyphen (server and instance).
+_BACKUP_NAME_RE = re.compile(r'^(.*-.*)-(\d{1,2})-(\d{1,2})_(\d{1,2})-(\d{1,2})-(\d{4})$', re.ASCII)
+
+# Read/write size for FTP data transfers (ftplib defaults to 8 KiB)
+FTP_BLOCK_SIZE = 1 << 20
+
+# Reuse an FTP session without a NOOP check if it was used this recently
+FTP_IDLE_PROBE_SECONDS = 30
+
+# Socket timeout for the NOOP liveness check on an idle FTP session
+FTP_PROBE_TIMEOUT = 10
+
+# Worker threads used to overlap unlink() calls in delete_backups()
+DELETE_WORKERS = 8
+
+# Files up to this size are compressed in memory and written as raw zip
+# entries; larger files are streamed through zipfile instead
+RAW_ENTRY_MAX_SIZE = 64 * 1024 * 1024
+
+# Limits on files queued for in-memory compression while writing an archive.
+# Each holds its data and compressed copy, so memory peaks at about twice
+# the byte limit (plus one file) regardless of core count
+ZIP_WINDOW_BYTES = 128 * 1024 * 1024
+ZIP_WINDOW_ENTRIES = 64
+
+# Extensions of already-compressed files, stored in archives without DEFLATE
+INCOMPRESSIBLE_EXTENSIONS = frozenset({
+    '.gz', '.tgz', '.xz', '.bz2', '.zst', '.lz4', '.zip', '.7z',
+    '.jpg', '.jpeg', '.png', '.gif', '.mp3', '.mp4', '.mkv', '.webm',
+})
+
+# Default DEFLATE level for backup archives (storage.compress_level).
+# Level 3 compresses roughly twice as fast as zlib's default of 6 while
+# producing archives only a few percent larger.
+DEFAULT_COMPRESS_LEVEL = 3
+
+
+def _read_config_cache(cache_path: str) -> Optional[Tuple]:
+    """
+    Read a (mtime_ns, size, config) entry from the config cache, or None
+
+    Unpickling runs arbitrary code, so the file is only trusted when it is a
+    regular file owned by the current user and not accessible to anyone else.
+    """
+    try:
+        fd = os.open(cache_path, os.O_RDONLY | getattr(os, 'O_NOFOLLOW', 0))
+    except OSError:
+        return None
+    try:
+        with os.fdopen(fd, 'rb') as f:
+            st = os.fstat(f.fileno())
+            if (not stat.S_ISREG(st.st_mode) or st.st_uid != os.geteuid()
+                    or st.st_mode & 0o077):
+                return None
+            cached = pickle.load(f)
+        if isinstance(cached, tuple) and len(cached) == 3:
+            return cached
+    except Exception:
+        pass
+    return None
+
+
+def _write_config_cache(cache_path: str, entry: Tuple):
+    """
+    Atomically replace the config cache; failures only cost a re-parse next time
+
+    The cache holds the parsed passwords, so it is created readable by the
+    owner only, whatever the umask.
+    """
+    tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+    try:
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    except OSError:
+        return
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump(entry, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, cache_path)
+    except Exception:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+
+
+@functools.lru_cache(maxsize=8)
+def _parse_config_cached(config_path: str, mtime_ns: int, size: int) -> Mapping:
+    """
+    Parse a config file once per (path, mtime, size)
+
+    Uses the pickled copy next to the file when it matches, otherwise parses
+    the YAML and refreshes that pickle.
+
+    Args:
+        config_path: Path to the configuration file
+        mtime_ns: File modification time in nanoseconds
+        size: File size in bytes
+
+    Returns:
+        Read-only mapping shared by every caller in this process
+
+    Raises:
+        Exception: If the file is missing or can't be parsed
+    """
+    cache_path = config_path + CONFIG_CACHE_SUFFIX
+    cached = _read_config_cache(cache_path)
+    if cached is not None and cached[:2] == (mtime_ns, size):
+        config = cached[2]
+    else:
+        try:
+            # libyaml reads bytes directly, skipping Python-level decoding
+            with open(config_path, 'rb') as f:
+                config = yaml.load(f, Loader=_SafeLoader)
+        except FileNotFoundError:
+            raise Exception(f"Configuration file not found: {config_path}")
+        except yaml.YAMLError as e:
+            raise Exception(f"Error parsing configuration file: {e}")
+        _write_config_cache(cache_path, (mtime_ns, size, config))
+
+    # Wrap so callers can't mutate the copy other instances share
+    return MappingProxyType(config or {})
+
+
+def _iter_files(root: str) -> Iterator[str]:
+    """
+    Recursively yield the paths of all non-directory entries under root
+
+    Uses os.scandir so entry types come from the directory read instead of
+    an extra stat per file. Like os.walk, symlinked directories are not
+    followed.
+
+    Args:
+        root: Directory to walk
+
+    Yields:
+        Path of each file (or file symlink) under root
+    """
+    with os.scandir(root) as it:
+        for entry in it:
+            if entry.is_dir():
+                if not entry.is_symlink():
+                    yield from _iter_files(entry.path)
+            else:
+                yield entry.path
+
+
+def _deflate_bytes(data: bytes, level: int) -> Tuple[int, bytes]:
+    """
+    Compress data as a raw DEFLATE stream
+
+    Args:
+        data: Uncompressed file contents
+        level: Compression level (1-9)
+
+    Returns:
+        Tuple of (CRC-32 of data, compressed bytes)
+    """
+    if deflate is not None:
+        return deflate.crc32(data), deflate.deflate_compress(data, level)
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS)
+    return zlib.crc32(data), compressor.compress(data) + compressor.flush()
+
+
+def _compress_file(path: str, compress_type: int, level: int) -> Tuple[int, int, bytes]:
+    """
+    Read a whole file and prepare its zip entry payload
+
+    Args:
+        path: File to read
+        compress_type: zipfile.ZIP_DEFLATED or zipfile.ZIP_STORED
+        level: Compression level (1-9) for DEFLATE
+
+    Returns:
+        Tuple of (CRC-32, uncompressed size, payload bytes)
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+    if compress_type == zipfile.ZIP_STORED:
+        return zlib.crc32(data), len(data), data
+    crc, payload = _deflate_bytes(data, level)
+    return crc, len(data), payload
+
+
+def _write_raw_entry(zipf: zipfile.ZipFile, zinfo: zipfile.ZipInfo,
+                     crc: int, file_size: int, payload: bytes):
+    """
+    Append an already-prepared entry to an open ZipFile
+
+    zipfile always compresses what it is given, so the local header and
+    payload are written directly and the entry is registered for the
+    central directory that ZipFile.close() writes.
+
+    Args:
+        zipf: ZipFile opened for writing
+        zinfo: Entry metadata (name, timestamp, permissions, compress_type)
+        crc: CRC-32 of the uncompressed data
+        file_size: Uncompressed size in bytes
+        payload: Raw DEFLATE stream, or the data itself for ZIP_STORED
+    """
+    zinfo.flag_bits &= ~0x08  # Sizes are known, no data descriptor
+    zinfo.CRC = crc
+    zinfo.file_size = file_size
+    zinfo.compress_size = len(payload)
+    zinfo.header_offset = zipf.fp.tell()
+    zipf.fp.write(zinfo.FileHeader())
+    zipf.fp.write(payload)
+    zipf.filelist.append(zinfo)
+    zipf.NameToInfo[zinfo.filename] = zinfo
+    zipf.start_dir = zipf.fp.tell()
+
+
+def _copy_file_fast(src: str, dst: str):
+    """
+    Copy a file and its metadata like shutil.copy2, but cheaper
+
+    Tries a reflink (FICLONE) first, which shares blocks on copy-on-write
+    filesystems such as Btrfs and XFS. Otherwise falls back to
+    shutil.copyfile, which copies in the kernel via sendfile on Linux.
+
+    Args:
+        src: Source file path
+        dst: Destination file path
+    """
+    cloned = False
+    if fcntl is not None:
+        with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+            try:
+                fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+                cloned = True
+            except OSError:
+                # Not supported here (other filesystem, cross-device, ...)
+                pass
+    if not cloned:
+        shutil.copyfile(src, dst)
+    shutil.copystat(src, dst)
+
+
+def _set_nodelay(sock: socket.socket):
+    """Disable Nagle's algorithm so small writes aren't held back waiting for ACKs"""
+    try:
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    except OSError:
+        pass
+
+
+class _TunedFTP(FTP):
+    """FTP client that sets TCP_NODELAY on every data connection"""
+
+    def ntransfercmd(self, cmd, rest=None):
+        conn, size = super().ntransfercmd(cmd, rest)
+        _set_nodelay(conn)
+        return conn, size
+
 
 class StorageManager:
     """Manages all storage operations for sipwise-backup"""
@@ -31,25 +329,34 @@ class StorageManager:
         """
         self.config_path = config_path
         self.config = self._load_config()
+        # Resolved once; a config reload means creating a new StorageManager
+        self._storage_type, self._storage_dir = self._resolve_storage_location()
         self.tmp_dir = "/opt/sipwise-backup/tmp"
         self._ensure_tmp_dir()
         self.logger = get_logger(config_path)
-
-    def _load_config(self) -> Dict:
+        self.compress_level = self._resolve_compress_level()
+        self._ftp = None  # Persistent FTP session, see _ftp_session()
+        self._ftp_remote = None  # Remote config the session was opened with
+        self._ftp_last_used = 0.0  # time.monotonic() when the session was last handed out
+        self._ftp_lock = threading.RLock()
+        self._list_cache = {}  # storage_dir -> (dir mtime_ns, parsed local listing)
+
+    def _load_config(self) -> Mapping:
         """
         Load configuration from config.yml
 
+        Parsed configs are shared per process (keyed by path, mtime and
+        size) and persisted as a pickle next to config.yml, so the YAML is
+        only parsed again after the file changes.
+
         Returns:
-            Dictionary containing configuration data
+            Read-only mapping containing configuration data
         """
         try:
-            with open(self.config_path, 'r') as f:
-                config = yaml.safe_load(f)
-            return config
+            st = os.stat(self.config_path)
         except FileNotFoundError:
             raise Exception(f"Configuration file not found: {self.config_path}")
-        except yaml.YAMLError as e:
-            raise Exception(f"Error parsing configuration file: {e}")
+        return _parse_config_cached(self.config_path, st.st_mtime_ns, st.st_size)
 
     def _ensure_tmp_dir(self):
         """Ensure the temporary directory exists"""
@@ -76,8 +383,9 @@ class StorageManager:
             raise Exception("FTP hostname not configured in config.yml")
         
         self.logger.debug(f"Connecting to FTP server: {hostname}:{port}")
-        ftp = FTP()
+        ftp = _TunedFTP()
         ftp.connect(hostname, port)
+        _set_nodelay(ftp.sock)
         ftp.login(username, password)
         
         # Create directory if it doesn't exist and navigate to it
@@ -90,16 +398,152 @@ class StorageManager:
         
         return ftp
 
+    @contextmanager
+    def _ftp_session(self, ftp: Optional[FTP] = None) -> Iterator[FTP]:
+        """
+        Borrow the persistent FTP session, connecting if needed
+
+        The connection is kept open between operations so a run of FTP
+        calls only pays for connect + login + CWD once. It is checked with
+        NOOP after being idle, re-opened if the remote config changed, and
+        dropped after any non-permission error so the next use reconnects.
+
+        Args:
+            ftp: Existing connection to use as-is (lets batch callers pass
+                the session they already hold)
+
+        Yields:
+            Connected FTP object positioned in the backup directory
+        """
+        if ftp is not None:
+            yield ftp
+            return
+
+        with self._ftp_lock:
+            ftp = self._get_ftp()
+            try:
+                yield ftp
+            except error_perm:
+                # The server rejected a command; the connection itself is fine
+                raise
+            except BaseException:
+                self.close_ftp_session()
+                raise
+            finally:
+                self._ftp_last_used = time.monotonic()
+
+    def _get_ftp(self) -> FTP:
+        """Return the cached FTP connection if usable, otherwise open a new one"""
+        remote_config = self.config.get('storage', {}).get('remote', {})
+        ftp = self._ftp
+        if ftp is not None and self._ftp_remote == remote_config:
+            if time.monotonic() - self._ftp_last_used < FTP_IDLE_PROBE_SECONDS:
+                return ftp
+            if self._ftp_alive(ftp):
+                return ftp
+
+        self.close_ftp_session()
+        self._ftp = self._ftp_connect()
+        self._ftp_remote = remote_config
+        return self._ftp
+
+    @staticmethod
+    def _ftp_alive(ftp: FTP) -> bool:
+        """Check an idle connection with NOOP, without blocking on a dead socket"""
+        try:
+            timeout = ftp.sock.gettimeout()
+            ftp.sock.settimeout(FTP_PROBE_TIMEOUT)
+            try:
+                ftp.voidcmd('NOOP')
+            finally:
+                ftp.sock.settimeout(timeout)
+            return True
+        except Exception:
+            return False
+
+    def close_ftp_session(self):
+        """Close the persistent FTP session, if one is open"""
+        with self._ftp_lock:
+            ftp, self._ftp = self._ftp, None
+            self._ftp_remote = None
+            if ftp is None:
+                return
+            try:
+                ftp.quit()
+            except Exception:
+                ftp.close()
+
     def _ftp_mkdirs(self, ftp: FTP, path: str):
-        """Create directories recursively on FTP server"""
+        """
+        Create directories recursively on FTP server
+
+        Probes from the deepest path upwards for the longest prefix that
+        already exists, then creates only the missing tail, so the usual
+        case of a missing leaf costs a few round-trips rather than two per
+        path component.
+
+        Args:
+            ftp: Open FTP connection
+            path: Directory path to create
+        """
         dirs = path.strip('/').split('/')
-        current = ''
-        for d in dirs:
-            current += '/' + d
+        existing = 0
+        for depth in range(len(dirs), 0, -1):
             try:
-                ftp.cwd(current)
+                ftp.cwd('/' + '/'.join(dirs[:depth]))
+                existing = depth
+                break
             except error_perm:
-                ftp.mkd(current)
+                continue
+
+        for depth in range(existing + 1, len(dirs) + 1):
+            ftp.mkd('/' + '/'.join(dirs[:depth]))
+
+    def _resolve_storage_location(self) -> Tuple[str, str]:
+        """
+        Read the storage type and matching directory from the config
+
+        Returns:
+            Tuple of (storage type, storage directory)
+        """
+        storage_config = self.config.get('storage', {})
+        storage_type = storage_config.get('type', 'local')
+
+        if storage_type == 'local':
+            directory = storage_config.get('local', {}).get('directory', '/var/backups/sipwise')
+        else:  # remote
+            directory = storage_config.get('remote', {}).get('directory', '/backups/sipwise')
+        return storage_type, directory
+
+    def _resolve_compress_level(self) -> int:
+        """
+        Read the archive compression level from the config
+
+        Returns:
+            DEFLATE level between 1 and 9 (DEFAULT_COMPRESS_LEVEL if unset or invalid)
+        """
+        level = self.config.get('storage', {}).get('compress_level', DEFAULT_COMPRESS_LEVEL)
+        # bool is an int subclass, so 'compress_level: true' would pass as 1
+        if isinstance(level, int) and not isinstance(level, bool) and 1 <= level <= 9:
+            return level
+        self.logger.warn(f"Invalid storage.compress_level {level!r}, using {DEFAULT_COMPRESS_LEVEL}")
+        print(f"[WARNING] Invalid storage.compress_level {level!r}, using {DEFAULT_COMPRESS_LEVEL}")
+        return DEFAULT_COMPRESS_LEVEL
+
+    def _resolve_download_parts(self) -> int:
+        """
+        Read the number of parallel download transfers from the config
+
+        Returns:
+            Part count of at least 1 (DEFAULT_DOWNLOAD_PARTS if unset or invalid)
+        """
+        parts = self.config.get('storage', {}).get('remote', {}).get('download_parts', DEFAULT_DOWNLOAD_PARTS)
+        try:
+            return max(1, int(parts))
+        except (TypeError, ValueError):
+            self.logger.warn(f"Invalid storage.remote.download_parts {parts!r}, using {DEFAULT_DOWNLOAD_PARTS}")
+            print(f"[WARNING] Invalid storage.remote.download_parts {parts!r}, using {DEFAULT_DOWNLOAD_PARTS}")
+            return DEFAULT_DOWNLOAD_PARTS
 
     def get_storage_type(self) -> str:
         """
@@ -108,7 +552,7 @@ class StorageManager:
         Returns:
             Storage type: 'local' or 'remote'
         """
-        return self.config.get('storage', {}).get('type', 'local')
+        return self._storage_type
 
     def get_storage_directory(self) -> str:
         """
@@ -117,13 +561,7 @@ class StorageManager:
         Returns:
             Storage directory path
         """
-        storage_type = self.get_storage_type()
-        storage_config = self.config.get('storage', {})
-
-        if storage_type == 'local':
-            return storage_config.get('local', {}).get('directory', '/var/backups/sipwise')
-        else:  # remote
-            return storage_config.get('remote', {}).get('directory', '/backups/sipwise')
+        return self._storage_dir
 
     def generate_backup_name(self, backup_type: str = "auto", extension: str = '.zip') -> str:
         """
@@ -154,66 +592,45 @@ class StorageManager:
             filename: Backup filename to parse
 
         Returns:
-            Dictionary with server_name, instance_type, type, and datetime, or None if invalid
+            Dictionary with server_name, instance_type, type, datetime and ts
+            (the datetime as a POSIX timestamp), or None if invalid
         """
         try:
             # Remove extension
             name_without_ext = os.path.splitext(filename)[0]
 
-            # Split by hyphens
-            parts = name_without_ext.split('-')
-
-            # Minimum parts needed:
             # Old format: server-instance-HH-MM_DD-MM-YYYY
-            #   Example: "myserver-master-14-30_13-01-2026" = 6 parts
+            #   Example: "myserver-master-14-30_13-01-2026"
             # New format: server-instance-auto-HH-MM_DD-MM-YYYY
-            #   Example: "myserver-master-auto-14-30_13-01-2026" = 7 parts
-            if len(parts) < 6:
+            #   Example: "myserver-master-auto-14-30_13-01-2026"
+            match = _BACKUP_NAME_RE.match(name_without_ext)
+            if not match:
                 return None
+            prefix, hour, minute, day, month, year = match.groups()
 
-            # Try to detect if backup_type is present (auto/manual)
-            # Time is always the last 4 parts: HH, MM_DD, MM, YYYY
+            # The part before the time is server-instance, optionally followed
+            # by the backup type (auto/manual) in the new format
+            prefix_parts = prefix.split('-')
             backup_type = "unknown"
-            
-            # Check if the 5th part from the end is 'auto' or 'manual'
-            if len(parts) >= 7 and parts[-5] in ['auto', 'manual']:
-                # New format with backup type
-                backup_type = parts[-5]
-                server_instance_parts = parts[:-5]  # everything before backup_type
-            else:
-                # Old format without backup type
-                server_instance_parts = parts[:-4]  # everything before time
-            
-            # Extract server_name and instance_type from server_instance_parts
-            instance_type = server_instance_parts[-1] if server_instance_parts else 'unknown'
-            server_name = '-'.join(server_instance_parts[:-1]) if len(server_instance_parts) > 1 else 'unknown'
-            
-            # Parse time parts: HH, MM_DD, MM, YYYY
-            time_parts = parts[-4:]
-            hour = time_parts[0]
-            minute_day = time_parts[1].split('_')
-            
-            # Expect MM_DD format with underscore
-            if len(minute_day) != 2:
-                # Malformed filename - missing underscore in MM_DD
-                return None
-            
-            minute = minute_day[0]
-            day = minute_day[1]
-            month = time_parts[2]
-            year = time_parts[3]
+            if len(prefix_parts) >= 3 and prefix_parts[-1] in ('auto', 'manual'):
+                backup_type = prefix_parts.pop()
 
-            # Create datetime object
-            dt = datetime.strptime(f"{year}-{month}-{day} {hour}:{minute}", "%Y-%m-%d %H:%M")
+            instance_type = prefix_parts[-1]
+            server_name = '-'.join(prefix_parts[:-1])
+
+            # Build the datetime directly rather than through strptime
+            dt = datetime(int(year), int(month), int(day), int(hour), int(minute))
 
             return {
                 'server_name': server_name,
                 'instance_type': instance_type,
                 'type': backup_type,
                 'datetime': dt,
+                'ts': dt.timestamp(),
                 'filename': filename
             }
         except Exception:
+            # e.g. out-of-range date/time fields
             return None
 
     def zip_directory(self, source_dir: str, output_filename: str) -> str:
@@ -228,37 +645,62 @@ class StorageManager:
             Path to the created zip file
         """
         zip_path = os.path.join(self.tmp_dir, output_filename)
-
-        with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-            for root, dirs, files in os.walk(source_dir):
-                for file in files:
-                    file_path = os.path.join(root, file)
-                    arcname = os.path.relpath(file_path, source_dir)
-                    zipf.write(file_path, arcname)
-
+        self._write_zip(source_dir, zip_path)
         return zip_path
 
-    def unzip_backup(self, zip_path: str, destination_dir: Optional[str] = None) -> str:
+    def _write_zip(self, source_dir: str, target):
         """
-        Unzip a backup file
+        Write a directory as a zip archive
 
         Args:
-            zip_path: Path to the zip file
-            destination_dir: Directory to extract to (default: tmp_dir)
-
-        Returns:
-            Path to the extracted directory
+            source_dir: Directory to zip
+            target: Output path, or a binary file object (which may be
+                unseekable, e.g. a pipe)
         """
-        if destination_dir is None:
-            destination_dir = self.tmp_dir
-
-        extract_path = os.path.join(destination_dir, 'extracted')
-        os.makedirs(extract_path, exist_ok=True)
-
-        with zipfile.ZipFile(zip_path, 'r') as zipf:
-            zipf.extractall(extract_path)
-
-        return extract_path
+        # Paths from _iter_files all start with source_dir + separator
+        prefix_len = len(os.path.join(source_dir, ''))
+
+        # Each entry is an independent DEFLATE stream, so files are compressed
+        # in a thread pool (zlib and libdeflate release the GIL) and written
+        # back in walk order. The window bounds how much data sits in memory.
+        workers = os.cpu_count() or 1
+        pending = deque()
+        pending_bytes = 0
+
+        with zipfile.ZipFile(target, 'w', zipfile.ZIP_DEFLATED,
+                             compresslevel=self.compress_level) as zipf, \
+                ThreadPoolExecutor(max_workers=workers) as executor:
+
+            def write_pending(max_entries: int, max_bytes: int):
+                nonlocal pending_bytes
+                while pending and (len(pending) > max_entries or pending_bytes > max_bytes):
+                    zinfo, future = pending.popleft()
+                    pending_bytes -= zinfo.file_size
+                    crc, file_size, payload = future.result()
+                    _write_raw_entry(zipf, zinfo, crc, file_size, payload)
+
+            for file_path in _iter_files(source_dir):
+                arcname = file_path[prefix_len:]
+                zinfo = zipfile.ZipInfo.from_file(file_path, arcname)
+
+                # Already-compressed data won't shrink; store it as-is
+                if os.path.splitext(arcname)[1].lower() in INCOMPRESSIBLE_EXTENSIONS:
+                    zinfo.compress_type = zipfile.ZIP_STORED
+                else:
+                    zinfo.compress_type = zipfile.ZIP_DEFLATED
+
+                if zinfo.file_size > RAW_ENTRY_MAX_SIZE:
+                    # Too big to hold in memory; let zipfile stream it
+                    write_pending(0, 0)
+                    zipf.write(file_path, arcname, compress_type=zinfo.compress_type)
+                    continue
+                pending.append((zinfo, executor.submit(
+                    _compress_file, file_path, zinfo.compress_type, self.compress_level
+                )))
+                pending_bytes += zinfo.file_size
+                write_pending(ZIP_WINDOW_ENTRIES, ZIP_WINDOW_BYTES)
+
+            write_pending(0, 0)
 
     def save_backup_local(self, zip_path: str) -> bool:
         """
@@ -277,37 +719,96 @@ class StorageManager:
             filename = os.path.basename(zip_path)
             destination = os.path.join(storage_dir, filename)
 
-            shutil.copy2(zip_path, destination)
+            _copy_file_fast(zip_path, destination)
+            self._list_cache.pop(storage_dir, None)
             return True
         except Exception as e:
-            print(f"Error saving backup locally: {e}")
+            self.logger.error(f"Error saving backup locally: {e}")
             return False
 
-    def save_backup_remote(self, zip_path: str) -> bool:
+    def save_backup_remote(self, zip_path: str, ftp: Optional[FTP] = None) -> bool:
         """
         Save a backup file to remote FTP storage
 
         Args:
             zip_path: Path to the zip file to save
+            ftp: Open FTP session to reuse (default: the persistent session)
 
         Returns:
             True if successful, False otherwise
         """
         try:
-            ftp = self._ftp_connect()
-            filename = os.path.basename(zip_path)
-            
-            self.logger.debug(f"Uploading {filename} to FTP server")
-            with open(zip_path, 'rb') as f:
-                ftp.storbinary(f'STOR {filename}', f)
-            
-            ftp.quit()
+            with self._ftp_session(ftp) as ftp:
+                filename = os.path.basename(zip_path)
+
+                self.logger.debug(f"Uploading {filename} to FTP server")
+                with open(zip_path, 'rb') as f:
+                    ftp.storbinary(f'STOR {filename}', f, blocksize=FTP_BLOCK_SIZE)
+
             self.logger.success(f"Backup uploaded to FTP: {filename}")
             return True
         except Exception as e:
             self.logger.error(f"Error saving backup to FTP: {e}")
             return False
 
+    def stream_backup_remote(self, source_dir: str, filename: str) -> Optional[int]:
+        """
+        Zip a directory straight into an FTP upload
+
+        The archive is written into a pipe by a worker thread while the
+        upload reads from the other end, so compression and network transfer
+        overlap and no archive is written to local disk.
+
+        Args:
+            source_dir: Directory to zip (typically tmp directory)
+            filename: Remote name for the backup file
+
+        Returns:
+            Size of the uploaded archive in bytes, or None on failure
+        """
+        read_fd, write_fd = os.pipe()
+        reader = os.fdopen(read_fd, 'rb', buffering=FTP_BLOCK_SIZE)
+        writer = os.fdopen(write_fd, 'wb', buffering=FTP_BLOCK_SIZE)
+        uploaded = 0
+
+        def compress():
+            with writer:
+                self._write_zip(source_dir, writer)
+
+        def count(block: bytes):
+            nonlocal uploaded
+            uploaded += len(block)
+
+        try:
+            with self._ftp_session() as ftp:
+                self.logger.debug(f"Streaming {filename} to FTP server")
+                with ThreadPoolExecutor(max_workers=1) as executor:
+                    future = executor.submit(compress)
+                    try:
+                        # Closing the reader (on success or error) makes a
+                        # still-running compressor fail fast with EPIPE
+                        with reader:
+                            ftp.storbinary(f'STOR {filename}', reader,
+                                           blocksize=FTP_BLOCK_SIZE, callback=count)
+                        future.result()
+                    except Exception:
+                        # Don't leave a truncated archive behind
+                        try:
+                            ftp.delete(filename)
+                        except Exception:
+                            pass
+                        raise
+
+            self.logger.success(f"Backup uploaded to FTP: {filename}")
+            return uploaded
+        except Exception as e:
+            self.logger.error(f"Error streaming backup to FTP: {e}")
+            return None
+        finally:
+            # Only still open if the session couldn't be established
+            reader.close()
+            writer.close()
+
     def save_backup(self, zip_path: str) -> bool:
         """
         Save a backup file to configured storage location
@@ -355,65 +856,114 @@ class StorageManager:
         """
         List backups from local storage
 
+        The parsed listing is cached against the directory's mtime, which
+        changes whenever a file is added, removed or renamed.
+
         Returns:
             List of backup metadata dictionaries
         """
         backups = []
         storage_dir = self.get_storage_directory()
 
-        if not os.path.exists(storage_dir):
+        try:
+            dir_mtime = os.stat(storage_dir).st_mtime_ns
+        except FileNotFoundError:
             return backups
 
-        for filename in os.listdir(storage_dir):
-            if filename.endswith('.zip'):
-                metadata = self.parse_backup_name(filename)
-                if metadata:
-                    file_path = os.path.join(storage_dir, filename)
-                    metadata['path'] = file_path
-                    metadata['size'] = os.path.getsize(file_path)
-                    backups.append(metadata)
+        cached = self._list_cache.get(storage_dir)
+        if cached is not None and cached[0] == dir_mtime:
+            # Callers may reorder or prune the list, so hand out a copy
+            return list(cached[1])
+
+        backups = list(self._iter_local_backup_metadata(storage_dir))
 
         # Sort by datetime, newest first
-        backups.sort(key=lambda x: x['datetime'], reverse=True)
-        return backups
+        backups.sort(key=itemgetter('ts'), reverse=True)
+        self._list_cache[storage_dir] = (dir_mtime, backups)
+        return list(backups)
+
+    def _iter_local_backup_metadata(self, storage_dir: str) -> Iterator[Dict]:
+        """
+        Yield metadata for each backup file in a local directory, unsorted
+
+        Args:
+            storage_dir: Directory to scan
 
-    def _list_backups_remote(self) -> List[Dict]:
+        Yields:
+            Backup metadata dictionaries
+        """
+        with os.scandir(storage_dir) as it:
+            for entry in it:
+                if entry.name.endswith('.zip') and entry.is_file():
+                    metadata = self.parse_backup_name(entry.name)
+                    if metadata:
+                        metadata['path'] = entry.path
+                        metadata['size'] = entry.stat().st_size
+                        yield metadata
+
+    def _list_backups_remote(self, ftp: Optional[FTP] = None) -> List[Dict]:
         """
         List backups from remote FTP storage
 
+        Args:
+            ftp: Open FTP session to reuse (default: the persistent session)
+
         Returns:
             List of backup metadata dictionaries
         """
         backups = []
         try:
-            ftp = self._ftp_connect()
-            
-            # List files in directory
-            files = ftp.nlst()
-            
-            for filename in files:
-                if filename.endswith('.zip'):
-                    metadata = self.parse_backup_name(filename)
-                    if metadata:
-                        # Get file size
-                        try:
-                            size = ftp.size(filename)
-                        except:
-                            size = 0
-                        metadata['size'] = size
-                        metadata['path'] = filename  # Remote path is just filename
-                        backups.append(metadata)
-            
-            ftp.quit()
+            with self._ftp_session(ftp) as ftp:
+                for filename, size in self._ftp_list_sizes(ftp):
+                    if filename.endswith('.zip'):
+                        metadata = self.parse_backup_name(filename)
+                        if metadata:
+                            metadata['size'] = size
+                            metadata['path'] = filename  # Remote path is just filename
+                            backups.append(metadata)
             
             # Sort by datetime, newest first
-            backups.sort(key=lambda x: x['datetime'], reverse=True)
+            backups.sort(key=itemgetter('ts'), reverse=True)
             
         except Exception as e:
             self.logger.error(f"Error listing backups from FTP: {e}")
         
         return backups
 
+    def _ftp_list_sizes(self, ftp: FTP) -> List[Tuple[str, int]]:
+        """
+        List the .zip files in the current FTP directory with their sizes
+
+        Uses a single MLSD listing (RFC 3659); servers without MLSD fall
+        back to NLST plus one SIZE command per .zip name.
+
+        Args:
+            ftp: Connected FTP object
+
+        Returns:
+            List of (filename, size in bytes) tuples
+        """
+        try:
+            return [
+                (name, int(facts.get('size', 0)))
+                for name, facts in ftp.mlsd(facts=['type', 'size'])
+                if facts.get('type', 'file') == 'file' and name.endswith('.zip')
+            ]
+        except error_perm as e:
+            self.logger.debug(f"MLSD not supported, falling back to NLST: {e}")
+
+        names = [name for name in ftp.nlst() if name.endswith('.zip')]
+        # NLST switches to ASCII mode; SIZE is only reliable in binary mode
+        ftp.voidcmd('TYPE I')
+        files = []
+        for filename in names:
+            try:
+                size = ftp.size(filename) or 0
+            except error_perm:
+                size = 0
+            files.append((filename, size))
+        return files
+
     def get_backup_by_name(self, filename: str) -> Optional[str]:
         """
         Get the full path to a backup file by filename
@@ -458,18 +1008,22 @@ class StorageManager:
 
         return None
 
-    def _download_backup_ftp(self, filename: str) -> Optional[str]:
-        """Download backup from FTP to tmp directory"""
+    def _download_backup_ftp(self, filename: str, ftp: Optional[FTP] = None,
+                             cancel: Optional[threading.Event] = None) -> Optional[str]:
+        """Download backup from FTP to tmp directory, stopping early if cancel is set"""
         try:
-            ftp = self._ftp_connect()
-            
-            local_path = os.path.join(self.tmp_dir, filename)
-            
-            self.logger.debug(f"Downloading {filename} from FTP")
-            with open(local_path, 'wb') as f:
-                ftp.retrbinary(f'RETR {filename}', f.write)
-            
-            ftp.quit()
+            with self._ftp_session(ftp) as ftp:
+                local_path = os.path.join(self.tmp_dir, filename)
+
+                self.logger.debug(f"Downloading {filename} from FTP")
+                with open(local_path, 'wb') as f:
+                    def write(block: bytes):
+                        if cancel is not None and cancel.is_set():
+                            raise Exception("Download cancelled")
+                        f.write(block)
+
+                    ftp.retrbinary(f'RETR {filename}', write, blocksize=FTP_BLOCK_SIZE)
+
             self.logger.success(f"Downloaded backup from FTP: {filename}")
             return local_path
             
@@ -477,11 +1031,119 @@ class StorageManager:
             self.logger.error(f"Error downloading backup from FTP: {e}")
             return None
 
+    def download_backup_multipart(self, filename: str, parts: Optional[int] = None,
+                                  cancel: Optional[threading.Event] = None) -> Optional[str]:
+        """
+        Download a backup to the tmp directory using parallel ranged transfers
+
+        For remote storage the file is split into byte ranges, each fetched
+        over its own FTP connection (REST + RETR) and written at its offset
+        with os.pwrite. Local storage, small files and servers without SIZE
+        support use the normal single-stream path.
+
+        Args:
+            filename: Name of the backup file
+            parts: Number of parallel transfers (default: storage.remote.download_parts)
+            cancel: Event that aborts a remote transfer in progress when set
+
+        Returns:
+            Path to the backup in tmp directory, or None if failed
+        """
+        if self.get_storage_type() == 'local':
+            return self.download_backup_to_tmp(filename)
+
+        if parts is None:
+            parts = self._resolve_download_parts()
+
+        try:
+            with self._ftp_session() as ftp:
+                ftp.voidcmd('TYPE I')
+                size = ftp.size(filename)
+        except Exception as e:
+            self.logger.debug(f"Multipart download unavailable, using single stream: {e}")
+            return self._download_backup_ftp(filename, cancel=cancel)
+
+        if not size or parts <= 1 or size < MULTIPART_MIN_SIZE:
+            return self._download_backup_ftp(filename, cancel=cancel)
+
+        local_path = os.path.join(self.tmp_dir, filename)
+        part_size = -(-size // parts)
+        ranges = [(start, min(part_size, size - start)) for start in range(0, size, part_size)]
+
+        try:
+            self.logger.debug(f"Downloading {filename} from FTP in {len(ranges)} parts")
+            fd = os.open(local_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+            try:
+                os.ftruncate(fd, size)
+                with ThreadPoolExecutor(max_workers=len(ranges)) as executor:
+                    futures = [
+                        executor.submit(self._download_range_ftp, filename, fd, offset, length, cancel)
+                        for offset, length in ranges
+                    ]
+                    for future in futures:
+                        future.result()
+            finally:
+                os.close(fd)
+        except Exception as e:
+            self.logger.error(f"Error downloading backup from FTP: {e}")
+            return None
+
+        self.logger.success(f"Downloaded backup from FTP: {filename}")
+        return local_path
+
+    def _download_range_ftp(self, filename: str, fd: int, offset: int, length: int,
+                            cancel: Optional[threading.Event] = None):
+        """Fetch one byte range of a remote file over its own FTP connection"""
+        ftp = self._ftp_connect()
+        try:
+            ftp.voidcmd('TYPE I')
+            position = offset
+            remaining = length
+            with ftp.transfercmd(f'RETR {filename}', rest=offset) as conn:
+                while remaining > 0:
+                    if cancel is not None and cancel.is_set():
+                        raise Exception("Download cancelled")
+                    chunk = conn.recv(min(FTP_BLOCK_SIZE, remaining))
+                    if not chunk:
+                        break
+                    os.pwrite(fd, chunk, position)
+                    position += len(chunk)
+                    remaining -= len(chunk)
+            if remaining:
+                raise Exception(f"Short read at offset {position} of {filename}")
+        finally:
+            # The data connection may have been cut mid-transfer, so don't wait for a reply
+            ftp.close()
+
     def clean_tmp(self):
-        """Remove all files from the tmp directory"""
-        if os.path.exists(self.tmp_dir):
-            shutil.rmtree(self.tmp_dir)
-            self._ensure_tmp_dir()
+        """
+        Remove all files from the tmp directory
+
+        The directory is renamed aside and recreated empty straight away; the
+        old tree (and any left behind by an interrupted run) is deleted in a
+        background thread so callers don't wait on the unlink walk.
+        """
+        trash = f"{self.tmp_dir}.trash-{os.getpid()}-{time.time_ns()}"
+        try:
+            os.rename(self.tmp_dir, trash)
+        except FileNotFoundError:
+            pass
+        self._ensure_tmp_dir()
+
+        trash_dirs = glob.glob(f"{glob.escape(self.tmp_dir)}.trash-*")
+        if trash_dirs:
+            # Not a daemon thread, so the interpreter finishes the delete before exiting
+            threading.Thread(
+                target=self._remove_trees,
+                args=(trash_dirs,),
+                name="clean-tmp"
+            ).start()
+
+    @staticmethod
+    def _remove_trees(paths: List[str]):
+        """Delete directory trees, ignoring errors"""
+        for path in paths:
+            shutil.rmtree(path, ignore_errors=True)
 
     def get_last_backup_time(self) -> Optional[datetime]:
         """
@@ -490,10 +1152,24 @@ class StorageManager:
         Returns:
             Datetime of the last backup, or None if no backups exist
         """
-        backups = self.list_backups()
-        if backups:
-            return backups[0]['datetime']
-        return None
+        if self.get_storage_type() == 'local':
+            storage_dir = self.get_storage_directory()
+            try:
+                dir_mtime = os.stat(storage_dir).st_mtime_ns
+            except FileNotFoundError:
+                return None
+
+            cached = self._list_cache.get(storage_dir)
+            if cached is not None and cached[0] == dir_mtime:
+                backups = cached[1][:1]
+            else:
+                # Only the newest is needed, so skip sorting the full listing
+                backups = self._iter_local_backup_metadata(storage_dir)
+        else:  # remote
+            backups = self._list_backups_remote()
+
+        newest = max(backups, key=itemgetter('ts'), default=None)
+        return newest['datetime'] if newest else None
 
     def delete_backup(self, filename: str) -> bool:
         """
@@ -512,29 +1188,54 @@ class StorageManager:
         else:
             return self.delete_backup_remote(filename)
 
+    def delete_backups(self, filenames: List[str]) -> int:
+        """
+        Delete several backup files from storage in one batch
+
+        Local deletions run in a thread pool; remote deletions share a
+        single FTP session instead of reconnecting for every file.
+
+        Args:
+            filenames: Names of the backup files to delete
+
+        Returns:
+            Number of backups deleted
+        """
+        if not filenames:
+            return 0
+
+        storage_type = self.get_storage_type()
+
+        if storage_type == 'local':
+            # Each unlink is independent, so overlap them in a small thread pool
+            with ThreadPoolExecutor(max_workers=min(DELETE_WORKERS, len(filenames))) as executor:
+                return sum(executor.map(self.delete_backup_local, filenames))
+        else:
+            # ftplib connections are not thread-safe; one session handles the batch
+            return self.delete_backups_remote(filenames)
+
     def delete_backup_local(self, filename: str) -> bool:
         """Delete a backup from local storage"""
         try:
-            file_path = self.get_backup_by_name(filename)
-            if file_path and os.path.exists(file_path):
-                os.remove(file_path)
-                self.logger.debug(f"Deleted backup: {filename}")
-                return True
+            # Unlink directly; a missing file is reported by the syscall itself
+            storage_dir = self.get_storage_directory()
+            os.remove(os.path.join(storage_dir, filename))
+            self._list_cache.pop(storage_dir, None)
+            self.logger.debug(f"Deleted backup: {filename}")
+            return True
+        except FileNotFoundError:
             return False
         except Exception as e:
             self.logger.error(f"Failed to delete backup: {e}")
-            print(f"Error deleting backup: {e}")
             return False
 
-    def delete_backup_remote(self, filename: str) -> bool:
+    def delete_backup_remote(self, filename: str, ftp: Optional[FTP] = None) -> bool:
         """Delete a backup from remote FTP storage"""
         try:
-            ftp = self._ftp_connect()
-            
-            self.logger.debug(f"Deleting {filename} from FTP")
-            ftp.delete(filename)
-            
-            ftp.quit()
+            with self._ftp_session(ftp) as ftp:
+                self.logger.debug(f"Deleting {filename} from FTP")
+                ftp.delete(filename)
+
             self.logger.success(f"Deleted backup from FTP: {filename}")
             return True
             
@@ -542,10 +1243,33 @@ class StorageManager:
             self.logger.error(f"Error deleting backup from FTP: {e}")
             return False
     
-    def test_ftp_connection(self) -> Tuple[bool, str]:
+    def delete_backups_remote(self, filenames: List[str]) -> int:
+        """Delete several backups from remote FTP storage over one session"""
+        deleted_count = 0
+        try:
+            with self._ftp_session() as ftp:
+                for filename in filenames:
+                    try:
+                        self.logger.debug(f"Deleting {filename} from FTP")
+                        ftp.delete(filename)
+                        deleted_count += 1
+                    except error_perm as e:
+                        self.logger.error(f"Error deleting backup from FTP: {filename}: {e}")
+        except Exception as e:
+            self.logger.error(f"Error deleting backups from FTP: {e}")
+
+        if deleted_count:
+            self.logger.success(f"Deleted {deleted_count} backup(s) from FTP")
+        return deleted_count
+
+    def test_ftp_connection(self, progress: Callable[[str], None] = print) -> Tuple[bool, str]:
         """
         Test FTP connection with current configuration
-        
+
+        Args:
+            progress: Called with each line of step-by-step output
+                (default: print; pass e.g. lambda _: None to silence it)
+
         Returns:
             Tuple of (success: bool, message: str)
         """
@@ -565,40 +1289,40 @@ class StorageManager:
             
             self.logger.debug(f"Testing FTP connection to {hostname}:{port}")
             
-            print(f"Testing FTP connection to {hostname}:{port}...")
-            print(f"Username: {username}")
-            print(f"Directory: {directory}")
-            print()
+            progress(f"Testing FTP connection to {hostname}:{port}...")
+            progress(f"Username: {username}")
+            progress(f"Directory: {directory}")
+            progress("")
             
             # Attempt connection
-            print("[1/4] Connecting to FTP server...")
+            progress("[1/4] Connecting to FTP server...")
             ftp = self._ftp_connect()
-            print("      ✓ Connected successfully")
+            progress("      ✓ Connected successfully")
             
             # Test directory listing
-            print("[2/4] Testing directory listing...")
+            progress("[2/4] Testing directory listing...")
             files = []
             ftp.retrlines('LIST', files.append)
-            print(f"      ✓ Listed {len(files)} item(s) in directory")
+            progress(f"      ✓ Listed {len(files)} item(s) in directory")
             
             # Test permissions (try to get current directory)
-            print("[3/4] Verifying permissions...")
+            progress("[3/4] Verifying permissions...")
             current_dir = ftp.pwd()
-            print(f"      ✓ Current directory: {current_dir}")
+            progress(f"      ✓ Current directory: {current_dir}")
             
             # Disconnect
-            print("[4/4] Disconnecting...")
+            progress("[4/4] Disconnecting...")
             ftp.quit()
-            print("      ✓ Disconnected successfully")
+            progress("      ✓ Disconnected successfully")
             
-            print()
+            progress("")
             success_msg = f"FTP connection test successful! Connected to {hostname}:{port}"
             self.logger.success("FTP connection test completed successfully")
             return True, success_msg
             
         except Exception as e:
             error_msg = f"FTP connection test failed: {str(e)}"
-            print(f"\n✗ {error_msg}")
+            progress(f"\n✗ {error_msg}")
             self.logger.error(f"FTP test failed: {e}")
             return False, error_msg
 